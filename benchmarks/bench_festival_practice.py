@@ -0,0 +1,72 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)  # The classifier loads its pickles relative to the repo root
+
+from cultural_practices.app import (
+    festival_encoder,
+    practice_encoder,
+    predict_festival_and_practice,
+    predict_festival_and_practice_batch,
+)
+
+TEMPLATES = [
+    "During {festival}, we follow the tradition of {practice}.",
+    "Every year at {festival} our village is busy {practice}.",
+    "My grandmother says {festival} is incomplete without {practice}.",
+    "We remember {festival} for {practice} and sharing food.",
+]
+
+
+def make_transcripts(n, seed=0):
+    rng = random.Random(seed)
+    festivals = list(festival_encoder.classes_)
+    practices = [p.lower() for p in practice_encoder.classes_]
+    return [
+        rng.choice(TEMPLATES).format(festival=rng.choice(festivals), practice=rng.choice(practices))
+        for _ in range(n)
+    ]
+
+
+def time_single(transcripts):
+    start = time.perf_counter()
+    for transcript in transcripts:
+        predict_festival_and_practice(transcript)
+    return time.perf_counter() - start
+
+
+def time_batch(transcripts, chunk_size):
+    start = time.perf_counter()
+    predict_festival_and_practice_batch(transcripts, chunk_size=chunk_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs batched festival/practice prediction throughput")
+    parser.add_argument("--n", type=int, default=5000, help="number of transcripts")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    transcripts = make_transcripts(args.n)
+
+    # Warm up both paths so the first timed run doesn't pay for lazy init
+    time_single(transcripts[:10])
+    time_batch(transcripts[:10], args.chunk_size)
+
+    single = min(time_single(transcripts) for _ in range(args.repeats))
+    batch = min(time_batch(transcripts, args.chunk_size) for _ in range(args.repeats))
+
+    print(f"transcripts: {args.n}, chunk size: {args.chunk_size}")
+    print(f"single: {single * 1e6 / args.n:8.1f} us/item  {args.n / single:10.0f} items/s")
+    print(f"batch : {batch * 1e6 / args.n:8.1f} us/item  {args.n / batch:10.0f} items/s")
+    print(f"speedup: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Tail latency of one LLM vs LLMRouter (hedging + fallback) against fake backends.
+
+    python benchmarks/bench_llm_router.py --calls 400 --concurrency 16 --slow-rate 0.05
+
+The primary fake answers in ~median_ms, but a --slow-rate fraction of its
+calls stall for --slow-ms; the secondary is uniformly a little slower.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+
+from fakes import LatencyModel, install_fake_aixplain
+
+PRIMARY_ID = "677c16166eb563bb611623c1"
+SECONDARY_ID = "6646261c6eb563165658bbb1"
+
+
+class StallingLatency(LatencyModel):
+    """LatencyModel with an extra chance of a long stall, the tail hedging is meant to cut."""
+
+    def __init__(self, median_ms, sigma, failure_rate, slow_rate, slow_ms, seed):
+        super().__init__(median_ms, sigma=sigma, failure_rate=failure_rate, rng=random.Random(seed))
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+
+    def sample(self):
+        seconds, failed = super().sample()
+        with self._lock:
+            if self.rng.random() < self.slow_rate:
+                seconds += self.slow_ms / 1000.0
+        return seconds, failed
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def run(llm, calls, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            llm.get_response(f"How should I irrigate plot {i}?")
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - start
+    ordered = sorted(latencies) or [float("nan")]
+    return {
+        "throughput": calls / wall,
+        "errors": errors,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single LLM vs hedged LLMRouter against fake backends")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=200)
+    parser.add_argument("--secondary-median-ms", type=float, default=250)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of primary calls that stall")
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="primary error rate")
+    parser.add_argument("--hedge-percentile", type=float, default=90)
+    parser.add_argument("--deadline", type=float, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AIXPLAIN_ACCESS_KEY", "offline-benchmark")
+    os.environ["MODEL_HANDLE_CACHE"] = "0"  # Keep fake model IDs out of the real model index
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    factory = install_fake_aixplain()
+    factory.latencies[PRIMARY_ID] = StallingLatency(
+        args.median_ms, 0.2, args.failure_rate, args.slow_rate, args.slow_ms, seed=1
+    )
+    factory.latencies[SECONDARY_ID] = StallingLatency(args.secondary_median_ms, 0.2, 0.0, 0.0, 0.0, seed=2)
+
+    from voice_assistant.model_classes import LLMModel
+    from voice_assistant.llm_router import LLMRouter
+
+    single = run(LLMModel(PRIMARY_ID), args.calls, args.concurrency)
+    router = LLMRouter(
+        [LLMModel(PRIMARY_ID), LLMModel(SECONDARY_ID)],
+        deadline=args.deadline,
+        hedge_percentile=args.hedge_percentile,
+    )
+    # Let the router learn the primary's latency distribution before measuring
+    run(router, 50, args.concurrency)
+    hedged = run(router, args.calls, args.concurrency)
+    router.close()
+
+    print(f"calls: {args.calls}, concurrency: {args.concurrency}, stall rate: {args.slow_rate}")
+    for name, result in (("single", single), ("router", hedged)):
+        print(f"{name:7s} {result['throughput']:7.1f} calls/s  p50 {result['p50_ms']:7.1f} ms  "
+              f"p95 {result['p95_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  errors {result['errors']}")
+    stats = router.stats()
+    print(f"hedges: {stats['hedges']}, hedge wins: {stats['hedge_wins']}, fallbacks: {stats['fallbacks']}, "
+          f"deadline misses: {stats['deadline_exceeded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Local stand-ins for the remote services, for offline benchmarking.
+
+``install_fake_aixplain`` replaces ``aixplain.factories`` in ``sys.modules``
+with a ModelFactory whose models sleep for a sampled latency and return canned
+results, and ``WeatherStub`` serves the two OpenWeather endpoints the
+irrigation recommender uses. Both must be set up before models.py is imported.
+"""
+import json
+import random
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Model IDs hardwired in voice_assistant/model_classes.py; anything else is treated as an LLM
+MODEL_KINDS = {
+    "65eee94812ee0172b4a9a6f7": "asr",
+    "60ddefbc8d38c51c5885f8ba": "ner",
+    "677c16166eb563bb611623c1": "llm",
+    "6646261c6eb563165658bbb1": "llm",
+    "6171efb6159531495cadf03d": "tts",
+}
+
+# Median latency and spread roughly matching what the hosted models take
+DEFAULT_PROFILES = {
+    "asr": {"median_ms": 900, "sigma": 0.3, "failure_rate": 0.0},
+    "ner": {"median_ms": 350, "sigma": 0.3, "failure_rate": 0.0},
+    "llm": {"median_ms": 1500, "sigma": 0.5, "failure_rate": 0.0},
+    "llm_long": {"median_ms": 6000, "sigma": 0.4, "failure_rate": 0.0},
+    "tts": {"median_ms": 700, "sigma": 0.3, "failure_rate": 0.0},
+    "weather": {"median_ms": 120, "sigma": 0.4, "failure_rate": 0.0},
+    "geocode": {"median_ms": 150, "sigma": 0.4, "failure_rate": 0.0},
+}
+
+TRANSCRIPTS = [
+    "During Pongal we clean the canals before sowing rice.",
+    "How much water does wheat need at the flowering stage?",
+    "My father floods the field every week, is drip irrigation better for sugarcane?",
+    "We use a stepwell for the village, can we store more rain water?",
+    "Is mulching useful for cotton on black soil?",
+]
+
+ANSWER = (
+    "Drip irrigation can work alongside your traditional canals. It delivers water straight to the roots, "
+    "so you can save up to 40% of the water. Start with one plot and compare the yield."
+)
+
+WATER_ANALYSIS = {
+    "traditional_practice": ["Stepwells", "Flood irrigation", "Tank storage"],
+    "traditional_efficiency": ["40%", "35%", "50%"],
+    "traditional_description": [
+        "Community wells that store monsoon water",
+        "Fields are flooded from canals",
+        "Village tanks collect runoff",
+    ],
+    "modern_practice": ["Rainwater harvesting with filters", "Drip irrigation", "Lined farm ponds"],
+    "improved_efficiency": ["70%", "90%", "75%"],
+    "modern_description": [
+        "Roof and field runoff is filtered into the stepwell",
+        "Water is delivered to each plant's root zone",
+        "Plastic lining cuts seepage losses",
+    ],
+}
+
+
+class LatencyModel:
+    """Lognormal latency around ``median_ms`` with an independent failure probability."""
+
+    def __init__(self, median_ms, sigma=0.0, failure_rate=0.0, scale=1.0, rng=None):
+        self.median_ms = median_ms * scale
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Return (seconds, failed) for one call."""
+        with self._lock:
+            seconds = self.median_ms / 1000.0
+            if self.sigma:
+                seconds *= self.rng.lognormvariate(0.0, self.sigma)
+            return seconds, self.rng.random() < self.failure_rate
+
+    def wait(self, name):
+        seconds, failed = self.sample()
+        time.sleep(seconds)
+        if failed:
+            raise RuntimeError(f"Injected {name} failure")
+
+
+def build_latency_models(profiles=None, scale=1.0, seed=0):
+    merged = {kind: dict(profile) for kind, profile in DEFAULT_PROFILES.items()}
+    for kind, overrides in (profiles or {}).items():
+        merged.setdefault(kind, {}).update(overrides)
+    return {
+        kind: LatencyModel(rng=random.Random(f"{seed}-{kind}"), scale=scale, **profile)
+        for kind, profile in merged.items()
+    }
+
+
+class FakeResponse:
+    def __init__(self, data, details=None):
+        self.data = data
+        self.details = details or []
+        self.status = "SUCCESS"
+
+
+class FakeModel:
+    def __init__(self, model_id, kind, latencies, audio_base_url=None):
+        self.id = model_id
+        self.kind = kind
+        self.latencies = latencies
+        self.audio_base_url = audio_base_url or "https://fake-tts.local/audio"
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _next_index(self):
+        with self._lock:
+            self._count += 1
+            return self._count
+
+    def _latency(self, payload):
+        # A profile keyed on the model ID (e.g. a slower fallback LLM) overrides its kind's
+        if self.id in self.latencies:
+            return self.latencies[self.id]
+        if self.kind == "llm" and str(payload.get("max_tokens")) == "1024":
+            return self.latencies["llm_long"]
+        return self.latencies[self.kind]
+
+    def _result(self, payload):
+        if self.kind == "asr":
+            return FakeResponse(TRANSCRIPTS[self._next_index() % len(TRANSCRIPTS)])
+        if self.kind == "ner":
+            text = payload.get("text", "")
+            details = []
+            for term, label in (("irrigation", "Skill"), ("water", "Product"), ("rice", "Product")):
+                start = text.lower().find(term)
+                if start >= 0:
+                    details.append({"boundingBox": {"start": start, "end": start + len(term)}, "data": label})
+            return FakeResponse(details, details=details)
+        if self.kind == "tts":
+            return FakeResponse(f"{self.audio_base_url}/{self._next_index()}.mp3")
+        if "traditional_practice" in payload.get("text", ""):
+            return FakeResponse("```json\n" + json.dumps(WATER_ANALYSIS, indent=2) + "\n```")
+        return FakeResponse(ANSWER)
+
+    def run(self, payload):
+        self._latency(payload).wait(self.kind)
+        return self._result(payload)
+
+    def run_stream(self, payload):
+        # Time to first token is a fifth of the call, the rest is spread over the words
+        latency = self._latency(payload)
+        seconds, failed = latency.sample()
+        time.sleep(seconds / 5)
+        if failed:
+            raise RuntimeError(f"Injected {self.kind} failure")
+        words = self._result(payload).data.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(seconds * 0.8 / len(words))
+            yield FakeResponse(word if i == 0 else " " + word)
+
+
+class FakeModelFactory:
+    latencies = build_latency_models()
+    audio_base_url = None
+
+    @classmethod
+    def get(cls, model_id, *args, **kwargs):
+        return FakeModel(model_id, MODEL_KINDS.get(model_id, "llm"), cls.latencies, cls.audio_base_url)
+
+
+def install_fake_aixplain(profiles=None, scale=1.0, seed=0, audio_base_url=None):
+    """Make ``from aixplain.factories import ModelFactory`` return FakeModelFactory.
+
+    TTS results point at ``audio_base_url`` (e.g. WeatherStub.audio_url), so
+    the TTS cache can download them.
+    """
+    FakeModelFactory.latencies = build_latency_models(profiles, scale=scale, seed=seed)
+    FakeModelFactory.audio_base_url = audio_base_url
+    package = types.ModuleType("aixplain")
+    package.__path__ = []
+    factories = types.ModuleType("aixplain.factories")
+    factories.ModelFactory = FakeModelFactory
+    package.factories = factories
+    sys.modules["aixplain"] = package
+    sys.modules["aixplain.factories"] = factories
+    return FakeModelFactory
+
+
+class _WeatherHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/tts/"):
+            # Fake synthesized clip; the TTS model's own latency was already spent in run()
+            payload = b"ID3" + bytes(16 * 1024)
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        query = parse_qs(url.query)
+        try:
+            lat = float(query["lat"][0])
+            lon = float(query["lon"][0])
+        except (KeyError, ValueError):
+            self._send_json(400, {"message": "lat and lon are required"})
+            return
+
+        if url.path.endswith("/weather"):
+            kind = "weather"
+        elif url.path.endswith("/reverse"):
+            kind = "geocode"
+        else:
+            self._send_json(404, {"message": "not found"})
+            return
+
+        seconds, failed = self.server.latencies[kind].sample()
+        time.sleep(seconds)
+        if failed:
+            self._send_json(503, {"message": f"Injected {kind} failure"})
+            return
+
+        # Deterministic per location, so cache hits and misses return the same values
+        rng = random.Random(f"{lat:.3f},{lon:.3f}")
+        if kind == "weather":
+            self._send_json(200, {
+                "main": {"temp": round(rng.uniform(290, 310), 2), "humidity": rng.randint(20, 95)},
+                "rain": {"1h": round(rng.choice([0, 0, 0, rng.uniform(0, 8)]), 2)},
+                "wind": {"speed": round(rng.uniform(0, 12), 2)},
+            })
+        else:
+            self._send_json(200, [{"name": f"Village {abs(int(lat * 100))}-{abs(int(lon * 100))}"}])
+
+
+class WeatherStub:
+    """OpenWeather look-alike on a local port, serving ``/data/2.5/weather`` and ``/geo/1.0/reverse``.
+
+    It also serves fake TTS clips under ``/tts/``.
+    """
+
+    def __init__(self, latencies=None, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), _WeatherHandler)
+        self.server.daemon_threads = True
+        self.server.latencies = latencies or build_latency_models()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def weather_url(self):
+        return f"{self.base_url}/data/2.5"
+
+    @property
+    def geo_url(self):
+        return f"{self.base_url}/geo/1.0"
+
+    @property
+    def audio_url(self):
+        return f"{self.base_url}/tts"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="weather-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,262 @@
+"""Offline load test of every route in models.py.
+
+aiXplain and OpenWeather are replaced by the local fakes in benchmarks/fakes.py,
+so a run costs no API calls and only measures this service:
+
+    python benchmarks/load_test.py --concurrency 1,8,32 --requests 200
+    python benchmarks/load_test.py --latency-scale 0.1 --compare benchmarks/results/before.json
+
+Throughput and p50/p95/p99 latency per endpoint and concurrency level are
+printed and saved as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+os.chdir(ROOT)  # The classifier loads its pickles relative to the repo root
+
+from fakes import WeatherStub, build_latency_models, install_fake_aixplain
+
+CROPS = ["wheat", "rice", "maize", "cotton", "sugarcane"]
+STAGES = ["seedling", "vegetative", "flowering", "maturity"]
+FESTIVAL_TRANSCRIPTS = [
+    "During Pongal we clean the village tank and share the first harvest.",
+    "At Baisakhi the whole family helps with harvesting wheat.",
+    "On Onam we decorate the courtyard and store rain water in pots.",
+]
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def make_scenarios(sessions, locations, seed):
+    """Return (name, method, path, body_fn) per route; body_fn(i) builds request i."""
+    rng = random.Random(seed)
+    location_pool = [
+        [round(rng.uniform(8, 30), 4), round(rng.uniform(70, 88), 4)] for _ in range(locations)
+    ]
+
+    def session(i):
+        return f"bench-{i % sessions}"
+
+    def plot(i):
+        return {
+            "crop": CROPS[i % len(CROPS)],
+            "stage": STAGES[i % len(STAGES)],
+            "location": location_pool[i % len(location_pool)],
+        }
+
+    # Conversation routes come first, so history reads and water analysis see populated sessions
+    return [
+        ("home", "GET", "/", None),
+        ("assistant_response", "POST", "/assistant_response",
+         lambda i: {"audio_path": f"bench-{i}.wav", "session_id": session(i)}),
+        ("assistant_response_stream", "POST", "/assistant_response/stream",
+         lambda i: {"audio_path": f"bench-{i}.wav", "session_id": session(i)}),
+        ("get_conversation_history", "GET", lambda i: f"/get_conversation_history?session_id={session(i)}", None),
+        ("get_conversation_history_page", "GET",
+         lambda i: f"/get_conversation_history?session_id={session(i)}&limit=5&offset=0", None),
+        ("water_analysis", "GET", lambda i: f"/water_analysis?session_id={session(i)}", None),
+        ("irrigation_plan", "POST", "/irrigation_plan", plot),
+        ("irrigation_plan_batch", "POST", "/irrigation_plan/batch",
+         lambda i: {"plots": [plot(i * 10 + j) for j in range(10)]}),
+        ("irrigation_plan_cache_stats", "GET", "/irrigation_plan/cache_stats", None),
+        ("predict_festival_practice", "POST", "/predict_festival_practice",
+         lambda i: {"transcript": FESTIVAL_TRANSCRIPTS[i % len(FESTIVAL_TRANSCRIPTS)]}),
+        ("predict_festival_practice_batch", "POST", "/predict_festival_practice/batch",
+         lambda i: {"transcripts": [FESTIVAL_TRANSCRIPTS[(i + j) % len(FESTIVAL_TRANSCRIPTS)] for j in range(32)]}),
+        ("predict_festival_practice_stats", "GET", "/predict_festival_practice/stats", None),
+        ("startup_report", "GET", "/startup_report", None),
+        ("http_metrics", "GET", "/http_metrics", None),
+        ("metrics", "GET", "/metrics", None),
+    ]
+
+
+def run_level(base_url, scenario, concurrency, n_requests):
+    import requests
+
+    name, method, path, body_fn = scenario
+    local = threading.local()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        url = base_url + (path(i) if callable(path) else path)
+        body = body_fn(i) if body_fn else None
+        start = time.perf_counter()
+        error = None
+        try:
+            response = session.request(method, url, json=body, timeout=300)
+            response.content  # Read the whole body, including streamed events
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if error:
+                errors.append(error)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    error_counts = {}
+    for error in errors:
+        error_counts[error] = error_counts.get(error, 0) + 1
+    return {
+        "endpoint": name,
+        "method": method,
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": len(errors),
+        "error_types": error_counts,
+        "wall_seconds": wall,
+        "throughput_rps": n_requests / wall if wall else None,
+        "mean_ms": sum(ordered) * 1000.0 / len(ordered),
+        "p50_ms": percentile(ordered, 50) * 1000.0,
+        "p95_ms": percentile(ordered, 95) * 1000.0,
+        "p99_ms": percentile(ordered, 99) * 1000.0,
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def start_app_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    for entry in (baseline or {}).get("results", []):
+        previous[(entry["endpoint"], entry["concurrency"])] = entry
+
+    header = f"{'endpoint':34s} {'conc':>4s} {'rps':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>6s}"
+    if previous:
+        header += f" {'p95 vs base':>11s}"
+    print(header)
+    for entry in results:
+        line = (f"{entry['endpoint']:34s} {entry['concurrency']:4d} {entry['throughput_rps']:9.1f} "
+                f"{entry['p50_ms']:9.1f} {entry['p95_ms']:9.1f} {entry['p99_ms']:9.1f} {entry['errors']:6d}")
+        base = previous.get((entry["endpoint"], entry["concurrency"]))
+        if base:
+            line += f" {(entry['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:+10.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the Flask routes with faked remote services")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", default="", help="comma-separated endpoint names to run (default: all)")
+    parser.add_argument("--profile", help="JSON file overriding fake latency profiles, "
+                                          "e.g. {\"llm\": {\"median_ms\": 800, \"failure_rate\": 0.02}}")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every fake median latency")
+    parser.add_argument("--sessions", type=int, default=20, help="distinct conversation sessions")
+    parser.add_argument("--locations", type=int, default=50, help="distinct farm locations")
+    parser.add_argument("--no-cache", action="store_true", help="disable the weather, geocode and plan caches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/load_test_<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to show p95 changes against")
+    args = parser.parse_args()
+
+    profiles = None
+    if args.profile:
+        with open(args.profile) as f:
+            profiles = json.load(f)
+    latencies = build_latency_models(profiles, scale=args.latency_scale, seed=args.seed)
+    stub = WeatherStub(latencies).start()
+
+    # Everything below is read when models.py and its components are imported
+    os.environ.setdefault("AIXPLAIN_ACCESS_KEY", "offline-benchmark")
+    os.environ["MODEL_HANDLE_CACHE"] = "0"  # Keep fake model IDs out of the real model index
+    os.environ.setdefault("WEATHER_API_KEY", "offline-benchmark")
+    os.environ["WEATHER_BASE_URL"] = stub.weather_url
+    os.environ["GEO_BASE_URL"] = stub.geo_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.no_cache:
+        os.environ.update({
+            "PLAN_CACHE": "0",
+            "WEATHER_CACHE_TTL": "0",
+            "WEATHER_CACHE_STALE_TTL": "0",
+            "GEOCODE_CACHE_TTL": "0",
+        })
+    install_fake_aixplain(profiles, scale=args.latency_scale, seed=args.seed, audio_base_url=stub.audio_url)
+
+    from models import app, registry
+
+    registry.warm_up()
+    server, base_url = start_app_server(app)
+
+    scenarios = make_scenarios(args.sessions, args.locations, args.seed)
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        scenarios = [scenario for scenario in scenarios if scenario[0] in wanted]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = []
+    try:
+        for scenario in scenarios:
+            for concurrency in levels:
+                entry = run_level(base_url, scenario, concurrency, args.requests)
+                results.append(entry)
+                print(f"{entry['endpoint']} @ {concurrency}: {entry['throughput_rps']:.1f} rps, "
+                      f"p95 {entry['p95_ms']:.1f} ms", file=sys.stderr)
+    finally:
+        server.shutdown()
+        stub.stop()
+        registry.close()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "concurrency": levels,
+            "requests": args.requests,
+            "latency_scale": args.latency_scale,
+            "profiles": profiles or {},
+            "sessions": args.sessions,
+            "locations": args.locations,
+            "cache": not args.no_cache,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"load_test_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common import metrics
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# e.g. "api.openweathermap.org=20,127.0.0.1=4"
+HOST_POOL_LIMITS = os.getenv("HTTP_HOST_POOL_LIMITS", "")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+OUTBOUND_LATENCY = metrics.register(metrics.Histogram(
+    "outbound_http_request_duration_seconds", "Outbound HTTP latency including retries", labels=("host",)
+))
+OUTBOUND_ERRORS = metrics.register(metrics.Counter(
+    "outbound_http_errors_total", "Outbound HTTP requests that failed or returned 5xx", labels=("host",)
+))
+
+
+def _parse_host_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, size = item.partition("=")
+        limits[host.strip()] = int(size)
+    return limits
+
+
+def _retry_policy(max_retries, backoff_factor, backoff_max):
+    kwargs = dict(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_max=backoff_max, **kwargs)
+    except TypeError:
+        # urllib3 < 2 caps backoff with a class attribute instead
+        retry = Retry(**kwargs)
+        retry.BACKOFF_MAX = backoff_max
+        return retry
+
+
+class _HostStats:
+    def __init__(self, samples=1024):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.status_codes = {}
+        self.latencies = deque(maxlen=samples)
+
+    def record(self, seconds, status=None, error=False):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.latencies.append(seconds)
+        if error:
+            self.errors += 1
+        if status is not None:
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return None
+            return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] * 1000.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "status_codes": dict(self.status_codes),
+            "mean_ms": self.total_seconds * 1000.0 / self.count if self.count else None,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": self.max_seconds * 1000.0,
+        }
+
+
+class HTTPClient:
+    """Pooled requests session with default timeouts, bounded retries and per-host latency stats.
+
+    The session is created per process, so a client built before a fork
+    never shares sockets with its children.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, backoff_max=BACKOFF_MAX, pool_maxsize=POOL_MAXSIZE,
+                 host_pool_limits=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_limits = host_pool_limits if host_pool_limits is not None else _parse_host_limits(HOST_POOL_LIMITS)
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._stats = {}
+
+    def _adapter(self, pool_maxsize):
+        retry = _retry_policy(self.max_retries, self.backoff_factor, self.backoff_max)
+        return HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    def _build_session(self):
+        session = requests.Session()
+        default = self._adapter(self.pool_maxsize)
+        session.mount("http://", default)
+        session.mount("https://", default)
+        for host, pool_maxsize in self.host_pool_limits.items():
+            adapter = self._adapter(pool_maxsize)
+            session.mount(f"http://{host}", adapter)
+            session.mount(f"https://{host}", adapter)
+        return session
+
+    @property
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self._session = self._build_session()
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _record(self, host, seconds, status=None, error=False):
+        OUTBOUND_LATENCY.observe(seconds, host)
+        if error:
+            OUTBOUND_ERRORS.inc(host)
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = self._stats[host] = _HostStats()
+            stats.record(seconds, status=status, error=error)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).hostname or ""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._record(host, time.perf_counter() - start, error=True)
+            raise
+        self._record(host, time.perf_counter() - start, status=response.status_code, error=response.status_code >= 500)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def host_metrics(self) -> dict:
+        with self._lock:
+            return {host: stats.summary() for host, stats in self._stats.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HTTPClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient()
+    return _client
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
+
+
+def host_metrics() -> dict:
+    return get_client().host_metrics()
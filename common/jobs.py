@@ -0,0 +1,239 @@
+"""Submit/poll execution of slow requests on a bounded pool.
+
+A long LLM generation submitted here holds one of ``max_workers`` job
+threads instead of a request thread, so short routes keep their threads.
+Once ``max_workers + max_queue`` jobs are outstanding, submit() raises
+JobQueueFull and the route answers 429.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "32"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+JOB_MAX_RESULTS = int(os.getenv("JOB_MAX_RESULTS", "10000"))
+# Set to share job status between serve.py workers, since a poll may land on any of them
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_QUEUE_SECONDS = metrics.register(metrics.Histogram(
+    "job_queue_seconds", "Time jobs waited for a worker", labels=("kind",)
+))
+JOB_RUN_SECONDS = metrics.register(metrics.Histogram(
+    "job_run_seconds", "Time jobs spent running", labels=("kind",)
+))
+JOBS = metrics.register(metrics.Counter("jobs_total", "Jobs by final status", labels=("kind", "status")))
+JOBS_REJECTED = metrics.register(metrics.Counter(
+    "jobs_rejected_total", "Jobs rejected because the queue was full", labels=("kind",)
+))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _new_job(job_id, kind):
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "status": QUEUED,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "queue_seconds": None,
+        "run_seconds": None,
+        "result": None,
+        "error": None,
+    }
+
+
+class MemoryJobStore:
+    """Job records in process memory, expired ``ttl`` seconds after they finish."""
+
+    def __init__(self, ttl=JOB_RESULT_TTL, max_entries=JOB_MAX_RESULTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now) -> None:
+        # Called with self._lock held; jobs are ordered by creation
+        while len(self._jobs) > self.max_entries:
+            self._jobs.popitem(last=False)
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and now - job["finished_at"] > self.ttl]:
+            del self._jobs[job_id]
+
+    def put(self, job) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+            self._expire(time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, so every worker process can answer a poll."""
+
+    def __init__(self, path, ttl=JOB_RESULT_TTL, timeout=5.0):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        db = self._connection()
+        db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, record TEXT NOT NULL, "
+                   "finished_at REAL)")
+        db.commit()
+
+    def _connection(self):
+        # One connection per thread and per process
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def put(self, job) -> None:
+        db = self._connection()
+        with db:
+            db.execute("INSERT OR REPLACE INTO jobs (job_id, record, finished_at) VALUES (?, ?, ?)",
+                       (job["job_id"], json.dumps(job), job["finished_at"]))
+            if job["finished_at"] is not None:
+                db.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.ttl,))
+
+    def get(self, job_id):
+        row = self._connection().execute(
+            "SELECT record, finished_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None or (row[1] is not None and time.time() - row[1] > self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class JobManager:
+    """Runs submitted callables on a bounded pool and keeps their results for polling.
+
+    Results must be JSON-serializable. The pool is created per process, so a
+    manager built before a fork works in every worker.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_LIMIT, store=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.store = store if store is not None else MemoryJobStore()
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._outstanding = 0
+        self._counters = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Called with self._lock held
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._executor_pid = os.getpid()
+            self._outstanding = 0
+        return self._executor
+
+    def submit(self, kind, fn, *args, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return its job ID; raises JobQueueFull when at capacity."""
+        with self._lock:
+            executor = self._get_executor()
+            if self._outstanding >= self.max_workers + self.max_queue:
+                self._counters["rejected"] += 1
+                JOBS_REJECTED.inc(kind)
+                raise JobQueueFull(f"{self._outstanding} jobs outstanding")
+            self._outstanding += 1
+            self._counters["submitted"] += 1
+
+        job = _new_job(uuid.uuid4().hex, kind)
+        try:
+            self.store.put(job)
+            executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._outstanding -= 1
+            raise
+        return job["job_id"]
+
+    def _run(self, job, fn, args, kwargs) -> None:
+        job["started_at"] = time.time()
+        job["queue_seconds"] = job["started_at"] - job["created_at"]
+        job["status"] = RUNNING
+        JOB_QUEUE_SECONDS.observe(job["queue_seconds"], job["kind"])
+        start = time.perf_counter()
+        try:
+            self.store.put(job)
+            job["result"] = fn(*args, **kwargs)
+            job["status"] = DONE
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["job_id"], job["kind"])
+            job["status"] = FAILED
+            job["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            job["run_seconds"] = time.perf_counter() - start
+            job["finished_at"] = time.time()
+            JOB_RUN_SECONDS.observe(job["run_seconds"], job["kind"])
+            JOBS.inc(job["kind"], job["status"])
+            with self._lock:
+                self._outstanding -= 1
+                self._counters[job["status"]] += 1
+            try:
+                self.store.put(job)
+            except Exception as e:
+                logger.error("Could not store result of job %s: %s", job["job_id"], e)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "outstanding": self._outstanding,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+
+
+def build_job_manager() -> JobManager:
+    store = SQLiteJobStore(JOB_STORE_PATH) if JOB_STORE_PATH else MemoryJobStore()
+    return JobManager(store=store)
@@ -0,0 +1,139 @@
+"""In-process latency histograms and counters, rendered in Prometheus text format.
+
+Metrics are per process: behind serve.py each worker reports its own.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for sub-millisecond LSTM forwards and 30 s LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {series[-1]}")
+        return lines
+
+
+STAGE_LATENCY = Histogram("stage_latency_seconds", "Latency of pipeline stages", labels=("stage",))
+STAGE_ERRORS = Counter("stage_errors_total", "Exceptions raised by pipeline stages", labels=("stage",))
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Flask request latency", labels=("endpoint", "method", "status")
+)
+REQUESTS = Counter("http_requests_total", "Flask requests served", labels=("endpoint", "method", "status"))
+
+_registry = [STAGE_LATENCY, STAGE_ERRORS, REQUEST_LATENCY, REQUESTS]
+
+
+def register(metric):
+    """Add ``metric`` to /metrics; a metric of the same name already registered is returned instead.
+
+    A module imported under two names (model_classes and
+    voice_assistant.model_classes) then shares one series rather than
+    rendering a duplicate.
+    """
+    for existing in _registry:
+        if existing.name == metric.name:
+            return existing
+    _registry.append(metric)
+    return metric
+
+
+@contextmanager
+def stage_timer(stage):
+    """Record the block's latency under ``stage``, counting it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+
+
+def timed(stage):
+    """Decorator form of stage_timer."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_request(endpoint, method, status, seconds) -> None:
+    REQUEST_LATENCY.observe(seconds, endpoint, method, str(status))
+    REQUESTS.inc(endpoint, method, str(status))
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -5,13 +5,25 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableLambda
 from langchain.chains import LLMChain
 # from langchain_ollama import ChatOllama
-import requests
 import sys
 import os
-from dataclasses import dataclass
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'voice_assistant')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from langchain_llm import CustomLLM2
+from common import http_client
+from common.metrics import stage_timer
+from voice_assistant.summary_memory import estimate_tokens, record_prompt_size
+
+logger = logging.getLogger(__name__)
 
 # model = CustomLLM2()
 
@@ -24,11 +36,57 @@ class ConservationAnalysis:
     improved_efficiency: List[str]
     modern_description: List[str]
 
+DEFAULT_HISTORY_URL = "http://127.0.0.1:7000/get_conversation_history"
+
+# Analyses are cached per session against a fingerprint of its history
+WATER_ANALYSIS_CACHE_SIZE = int(os.getenv("WATER_ANALYSIS_CACHE_SIZE", "1000"))
+# Send only the turns added since the cached analysis, plus that analysis, instead of the whole history
+WATER_ANALYSIS_INCREMENTAL = os.getenv("WATER_ANALYSIS_INCREMENTAL", "0") == "1"
+# While a background refresh is running, answer with the previous analysis instead of waiting for it
+WATER_ANALYSIS_SERVE_STALE = os.getenv("WATER_ANALYSIS_SERVE_STALE", "1") == "1"
+# Background refreshes get their own small pool so they never queue ahead of request-path model calls
+WATER_ANALYSIS_REFRESH_WORKERS = int(os.getenv("WATER_ANALYSIS_REFRESH_WORKERS", "2"))
+
+
+def history_fingerprint(history) -> str:
+    return hashlib.sha256(json.dumps(history, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CachedAnalysis:
+    fingerprint: str
+    history_length: int
+    analysis: ConservationAnalysis
+    computed_at: float
+
+
 class WaterConservationAnalyzer:
 
-    def __init__(self):
+    def __init__(self, llm_model=None, history_provider=None, history_url=None,
+                 cache_size=WATER_ANALYSIS_CACHE_SIZE, incremental=WATER_ANALYSIS_INCREMENTAL,
+                 serve_stale=WATER_ANALYSIS_SERVE_STALE, memory=None, refresh_workers=WATER_ANALYSIS_REFRESH_WORKERS):
+        # history_provider(session_id) returns the formatted history list and is read
+        # in-process; without one the history is fetched from history_url over HTTP.
+        self.history_provider = history_provider
+        self.history_url = history_url or DEFAULT_HISTORY_URL
+        self.cache_size = cache_size
+        self.incremental = incremental
+        self.serve_stale = serve_stale
+        self.refresh_workers = refresh_workers
+        # With a RollingSummaryMemory (in-process history only) the full prompt gets the
+        # summary plus recent turns instead of the raw history list
+        self.memory = memory if history_provider is not None else None
 
-        self.llm = CustomLLM2()
+        self._cache = OrderedDict()  # session_id -> _CachedAnalysis, least recently used first
+        self._inflight = {}  # session_id -> (fingerprint, Future)
+        self._pending_refresh = set()
+        self._lock = threading.Lock()
+        self._refresh_executor = None
+        self._refresh_executor_pid = None
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "full_runs": 0, "incremental_runs": 0,
+                          "background_refreshes": 0, "errors": 0}
+
+        self.llm = CustomLLM2(model=llm_model) if llm_model is not None else CustomLLM2()
 
         self._setup_schemas()
         
@@ -84,21 +142,63 @@ class WaterConservationAnalyzer:
             template=template
         )
 
-    def get_history(self):
-        response = requests.get("http://127.0.0.1:7000/get_conversation_history")
+        incremental_template = """
+        You previously analyzed a user's conversational history and compared the top 3 traditional and modern water conservation practices to address cultural resistance. The conversation has continued since then.
+
+        Guidelines:
+        - Start from the previous analysis and keep whatever still holds
+        - Revise it only where the new conversation turns add or change information
+        - Keep exactly the same fields and list lengths
+
+        Previous analysis: {previous_analysis}
+
+        New conversation turns: {new_turns}
+
+        {format_instructions}
+        """
+
+        self.incremental_prompt = PromptTemplate(
+            input_variables=["previous_analysis", "new_turns"],
+            partial_variables={"format_instructions": self.output_parser.get_format_instructions()},
+            template=incremental_template
+        )
+
+    def get_history(self, session_id="default"):
+        if self.history_provider is not None:
+            return self.history_provider(session_id)
+        response = http_client.get(self.history_url, params={"session_id": session_id})
         return response.json()["history"]
 
 
-    def analyze_practices(self):
+    def _history_input(self, session_id, history):
+        if self.memory is None:
+            return history
+        return self.memory.render(session_id, reserved_tokens=estimate_tokens(self.prompt.template))
+
+    def _build_prompt(self, session_id, history, previous):
+        # Incremental only if the cached analysis was made from a prefix of this history
+        # (not e.g. a session that was trimmed or cleared since)
+        if (self.incremental and previous is not None and 0 < previous.history_length < len(history)
+                and history_fingerprint(history[:previous.history_length]) == previous.fingerprint):
+            self._counters["incremental_runs"] += 1
+            return self.incremental_prompt.format(
+                previous_analysis=json.dumps(asdict(previous.analysis)),
+                new_turns=history[previous.history_length:]
+            )
+        self._counters["full_runs"] += 1
+        return self.prompt.format(user_input=self._history_input(session_id, history))
+
+    def _run(self, session_id, history, previous=None):
         try:
-            problem_description = self.get_history()
-            formatted_prompt = self.prompt.format(user_input=problem_description)
+            formatted_prompt = self._build_prompt(session_id, history, previous)
+            record_prompt_size("water_analysis", formatted_prompt)
             
             output = self.llm.invoke(formatted_prompt)
             
             # print(f"THE OUTPUT IS: {output}")
             
-            parsed = self.output_parser.parse(output)
+            with stage_timer("output_parse"):
+                parsed = self.output_parser.parse(output)
             
             return ConservationAnalysis(
                 traditional_practice=parsed["traditional_practice"],
@@ -111,5 +211,120 @@ class WaterConservationAnalyzer:
             # return output
         
         except Exception as e:
-            print(f"Error processing input: {str(e)}")
+            logger.exception("Error processing input: %s", e)
             return None
+
+    def _compute(self, session_id, history, fingerprint, future):
+        with self._lock:
+            previous = self._cache.get(session_id)
+        try:
+            analysis = self._run(session_id, history, previous)
+            if analysis is not None:
+                with self._lock:
+                    self._cache[session_id] = _CachedAnalysis(fingerprint, len(history), analysis, time.time())
+                    self._cache.move_to_end(session_id)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            else:
+                self._counters["errors"] += 1
+            future.set_result(analysis)
+            return analysis
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._finish(session_id, future)
+
+    def _finish(self, session_id, future) -> None:
+        """Release the session's in-flight slot if ``future`` still holds it, then run any refresh queued behind it."""
+        with self._lock:
+            if self._inflight.get(session_id, (None, None))[1] is not future:
+                return
+            del self._inflight[session_id]
+            again = session_id in self._pending_refresh
+            self._pending_refresh.discard(session_id)
+        if again:
+            self.refresh_in_background(session_id)
+
+    def _get_refresh_executor(self) -> ThreadPoolExecutor:
+        if self._refresh_executor is None or self._refresh_executor_pid != os.getpid():
+            with self._lock:
+                if self._refresh_executor is None or self._refresh_executor_pid != os.getpid():
+                    self._refresh_executor = ThreadPoolExecutor(
+                        max_workers=self.refresh_workers, thread_name_prefix="water-refresh"
+                    )
+                    self._refresh_executor_pid = os.getpid()
+        return self._refresh_executor
+
+    def analyze_practices(self, session_id="default"):
+        """Return the analysis for the session's current history, recomputing only when it changed.
+
+        Concurrent calls for the same history share one LLM run. When a refresh
+        is already running and serve_stale is set, the previous analysis is
+        returned right away.
+        """
+        history = self.get_history(session_id)
+        fingerprint = history_fingerprint(history)
+
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is not None and cached.fingerprint == fingerprint:
+                self._cache.move_to_end(session_id)
+                self._counters["hits"] += 1
+                return cached.analysis
+
+            inflight = self._inflight.get(session_id)
+            if inflight is not None and cached is not None and self.serve_stale:
+                self._counters["stale_hits"] += 1
+                return cached.analysis
+            # A refresh that hasn't read the history yet (fingerprint None) will see at least this much
+            if inflight is not None and inflight[0] in (fingerprint, None):
+                future, leader = inflight[1], False
+            else:
+                future, leader = Future(), True
+                self._inflight[session_id] = (fingerprint, future)
+            self._counters["misses"] += 1
+
+        if not leader:
+            return future.result()
+        return self._compute(session_id, history, fingerprint, future)
+
+    def refresh_in_background(self, session_id="default") -> None:
+        """Recompute the session's analysis off the request path, e.g. after a new turn.
+
+        Refreshes requested while an analysis is running, whether started by a refresh
+        or by a request, collapse into a single follow-up run once it finishes.
+        """
+        with self._lock:
+            if session_id in self._inflight:
+                self._pending_refresh.add(session_id)
+                return
+            # Claim the slot now, so a GET arriving before the worker starts sees the refresh
+            future = Future()
+            self._inflight[session_id] = (None, future)
+
+        def refresh():
+            try:
+                history = self.get_history(session_id)
+                fingerprint = history_fingerprint(history)
+                with self._lock:
+                    cached = self._cache.get(session_id)
+                    if self._inflight.get(session_id, (None, None))[1] is future:
+                        self._inflight[session_id] = (fingerprint, future)
+                if cached is not None and cached.fingerprint == fingerprint:
+                    future.set_result(cached.analysis)
+                    self._finish(session_id, future)
+                else:
+                    self._counters["background_refreshes"] += 1
+                    self._compute(session_id, history, fingerprint, future)
+            except Exception as e:
+                logger.warning("Background water analysis failed for %s: %s", session_id, e)
+                if not future.done():
+                    future.set_exception(e)
+                self._finish(session_id, future)
+
+        self._get_refresh_executor().submit(refresh)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._cache), "refreshing": len(self._inflight)}
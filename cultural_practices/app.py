@@ -1,60 +1,79 @@
-import pandas as pd
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.feature_extraction.text import TfidfVectorizer
+import os
+import sys
+import numpy as np
 import joblib
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.metrics import stage_timer
+
 vectorizer = joblib.load("cultural_practices/vectorizer.pkl")
 festival_encoder = joblib.load("cultural_practices/festival_encoder.pkl")
 practice_encoder = joblib.load("cultural_practices/practice_encoder.pkl")
 
-input_size = 62  
+input_size = len(vectorizer.vocabulary_)
 hidden_size = 128
 num_layers = 1
 num_festivals = len(festival_encoder.classes_)
 num_practices = len(practice_encoder.classes_)
+batch_chunk_size = 1024  # Max rows per LSTM forward, caps the dense gate activations
+
+model_path = "cultural_practices/lstm_model.pth"
+numpy_weights_path = "cultural_practices/lstm_model.npz"
+
+# "torch" (default) or "numpy". The NumPy engine doesn't import torch
+# once lstm_model.npz has been exported.
+lstm_engine = os.getenv("LSTM_ENGINE", "torch")
 
-class LSTMClassifier(nn.Module):
-    def __init__(self, input_size, hidden_size, num_layers, num_festivals, num_practices):
-        super(LSTMClassifier, self).__init__()
-        self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
-        self.fc_festival = nn.Linear(hidden_size, num_festivals)
-        self.fc_practice = nn.Linear(hidden_size, num_practices)
-
-    def forward(self, x):
-        h0 = torch.zeros(1, x.size(0), 128).to(x.device)
-        c0 = torch.zeros(1, x.size(0), 128).to(x.device)
-        out, _ = self.lstm(x.unsqueeze(1), (h0, c0))
-        out = out[:, -1, :]
-        festival_output = self.fc_festival(out)
-        practice_output = self.fc_practice(out)
-        return festival_output,practice_output
-
-model = LSTMClassifier(input_size, hidden_size, num_layers, num_festivals, num_practices)
-model.load_state_dict(torch.load("cultural_practices/lstm_model.pth"))
-model.eval()
+def load_engine(engine=lstm_engine):
+    if engine == "torch":
+        from cultural_practices.lstm_classifier import load_torch_engine
+        return load_torch_engine(model_path, input_size, hidden_size, num_layers, num_festivals, num_practices)
+    if engine == "numpy":
+        from cultural_practices.numpy_engine import load_numpy_engine
+        return load_numpy_engine(numpy_weights_path, model_path)
+    raise ValueError(f"Unknown LSTM engine: {engine}")
+
+model = load_engine()
 
 def predict_festival_and_practice(transcript):
-    model.eval()
-    with torch.no_grad():
-        text_tfidf = vectorizer.transform([transcript]).toarray()
-        text_tensor = torch.tensor(text_tfidf, dtype=torch.float32)
+    with stage_timer("tfidf_vectorize"):
+        text_tfidf = vectorizer.transform([transcript]).astype(np.float32)
 
-        festival_output, practice_output = model(text_tensor)
-        festival_id = torch.argmax(festival_output, dim=1).item()
-        practice_id = torch.argmax(practice_output, dim=1).item()
+    with stage_timer("lstm_forward"):
+        festival_output, practice_output = model(text_tfidf)
+    festival_id = int(np.argmax(festival_output, axis=1)[0])
+    practice_id = int(np.argmax(practice_output, axis=1)[0])
 
-        predicted_festival = festival_encoder.inverse_transform([festival_id])[0]
-        predicted_practice = practice_encoder.inverse_transform([practice_id])[0]
+    predicted_festival = festival_encoder.inverse_transform([festival_id])[0]
+    predicted_practice = practice_encoder.inverse_transform([practice_id])[0]
 
     return predicted_festival, predicted_practice
 
-example_text = "During Holi, we follow the tradition of cleaning water bodies before festival."
-pred_festival, pred_practice = predict_festival_and_practice(example_text)
+def predict_festival_and_practice_batch(transcripts, chunk_size=batch_chunk_size):
+    if len(transcripts) == 0:
+        return []
+
+    festival_ids = []
+    practice_ids = []
+    # TF-IDF rows stay sparse (CSR) all the way into the first gate projection
+    with stage_timer("tfidf_vectorize"):
+        text_tfidf = vectorizer.transform(transcripts).astype(np.float32)
+    for start in range(0, text_tfidf.shape[0], chunk_size):
+        chunk = text_tfidf[start:start + chunk_size]
+
+        with stage_timer("lstm_forward"):
+            festival_output, practice_output = model(chunk)
+        festival_ids.append(np.argmax(festival_output, axis=1))
+        practice_ids.append(np.argmax(practice_output, axis=1))
+
+    predicted_festivals = festival_encoder.inverse_transform(np.concatenate(festival_ids)).tolist()
+    predicted_practices = practice_encoder.inverse_transform(np.concatenate(practice_ids)).tolist()
+
+    return list(zip(predicted_festivals, predicted_practices))
+
+if __name__ == "__main__":
+    example_text = "During Holi, we follow the tradition of cleaning water bodies before festival."
+    pred_festival, pred_practice = predict_festival_and_practice(example_text)
 
-print("Predicted Festival:",pred_festival)
-print("Cultural Practice:",pred_practice)
\ No newline at end of file
+    print("Predicted Festival:",pred_festival)
+    print("Cultural Practice:",pred_practice)
\ No newline at end of file
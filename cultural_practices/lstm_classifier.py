@@ -0,0 +1,57 @@
+import numpy as np
+import scipy.sparse as sp
+import torch
+import torch.nn as nn
+
+
+class LSTMClassifier(nn.Module):
+    def __init__(self, input_size, hidden_size, num_layers, num_festivals, num_practices):
+        super(LSTMClassifier, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
+        self.fc_festival = nn.Linear(hidden_size, num_festivals)
+        self.fc_practice = nn.Linear(hidden_size, num_practices)
+
+    def forward(self, x):
+        h0 = torch.zeros(1, x.size(0), 128).to(x.device)
+        c0 = torch.zeros(1, x.size(0), 128).to(x.device)
+        out, _ = self.lstm(x.unsqueeze(1), (h0, c0))
+        out = out[:, -1, :]
+        festival_output = self.fc_festival(out)
+        practice_output = self.fc_practice(out)
+        return festival_output,practice_output
+
+    def forward_sparse(self, x):
+        # Single step from zero state: only the input projection matters, so the
+        # sparse TF-IDF rows go straight into a sparse-dense matmul.
+        gates = torch.sparse.mm(x, self.lstm.weight_ih_l0.t()) + self.lstm.bias_ih_l0 + self.lstm.bias_hh_l0
+        input_gate, _, cell_gate, output_gate = gates.chunk(4, dim=1)
+        out = torch.sigmoid(output_gate) * torch.tanh(torch.sigmoid(input_gate) * torch.tanh(cell_gate))
+        festival_output = self.fc_festival(out)
+        practice_output = self.fc_practice(out)
+        return festival_output,practice_output
+
+
+class TorchEngine:
+    """Runs LSTMClassifier on float32 NumPy or SciPy sparse features and returns NumPy logits."""
+
+    def __init__(self, model: LSTMClassifier):
+        self.model = model
+        self.model.eval()
+
+    def __call__(self, features):
+        with torch.no_grad():
+            if sp.issparse(features):
+                coo = features.tocoo()
+                x = torch.sparse_coo_tensor(
+                    np.vstack([coo.row, coo.col]), coo.data.astype(np.float32), coo.shape
+                )
+                festival_output, practice_output = self.model.forward_sparse(x)
+            else:
+                festival_output, practice_output = self.model(torch.from_numpy(features))
+        return festival_output.numpy(), practice_output.numpy()
+
+
+def load_torch_engine(model_path, input_size, hidden_size, num_layers, num_festivals, num_practices) -> TorchEngine:
+    model = LSTMClassifier(input_size, hidden_size, num_layers, num_festivals, num_practices)
+    model.load_state_dict(torch.load(model_path, map_location="cpu"))
+    return TorchEngine(model)
@@ -0,0 +1,136 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collects concurrent single-item requests into one batched call.
+
+    Items submitted within ``max_wait_ms`` of the first queued item (or until
+    ``max_batch_size`` items are waiting) are passed to ``batch_fn`` as one list,
+    and each caller gets back its own element of the returned list.
+    """
+
+    def __init__(self, batch_fn, max_wait_ms: float = 3.0, max_batch_size: int = 64):
+        self.batch_fn = batch_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_batch_time = 0.0
+        self._batch_sizes = Counter()
+
+    def _ensure_worker(self) -> None:
+        # The worker thread is started lazily, and restarted in a forked child
+        # where the parent's thread no longer exists.
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, item) -> Future:
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._closed = True
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            items = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = list(self.batch_fn(items))
+                if len(results) != len(batch):
+                    raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                self._errors += 1
+                # Every caller still waiting gets the error rather than hanging until its timeout
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finished = time.perf_counter()
+
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._total_batch_time += finished - started
+            self._total_wait += sum(started - enqueued for _, _, enqueued in batch)
+
+            if self._closed:
+                return
+
+    def stats(self) -> dict:
+        batches = self._batches or 1
+        items = self._items or 1
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "items": self._items,
+            "errors": self._errors,
+            "mean_batch_size": self._items / batches,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "mean_queue_wait_ms": self._total_wait * 1000.0 / items,
+            "mean_batch_time_ms": self._total_batch_time * 1000.0 / batches,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_size": self.max_batch_size,
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._queue.put(None)
+            self._worker.join()
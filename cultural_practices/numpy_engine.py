@@ -0,0 +1,151 @@
+import os
+import sys
+import argparse
+import hashlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# LSTMClassifier always runs one timestep from h0 = c0 = 0, so the cell reduces to
+#   i, g, o = sigmoid(W_i x + b_i), tanh(W_g x + b_g), sigmoid(W_o x + b_o)
+#   h = o * tanh(i * g)
+# W_hh only ever multiplies h0 and the forget gate only ever scales c0, so both
+# drop out; their biases still count and are folded into the fused gate bias.
+
+def fuse_state_dict(state_dict) -> dict:
+    """Turn an LSTMClassifier state dict (NumPy arrays) into fused inference weights."""
+    w_ih = state_dict["lstm.weight_ih_l0"]
+    bias = state_dict["lstm.bias_ih_l0"] + state_dict["lstm.bias_hh_l0"]
+    hidden = w_ih.shape[0] // 4
+
+    # PyTorch gate order is i, f, g, o
+    keep = np.r_[0:hidden, 2 * hidden:4 * hidden]
+    w_heads = np.concatenate([state_dict["fc_festival.weight"], state_dict["fc_practice.weight"]])
+    b_heads = np.concatenate([state_dict["fc_festival.bias"], state_dict["fc_practice.bias"]])
+
+    return {
+        "w_gates": np.ascontiguousarray(w_ih[keep].T, dtype=np.float32),
+        "b_gates": bias[keep].astype(np.float32),
+        "w_heads": np.ascontiguousarray(w_heads.T, dtype=np.float32),
+        "b_heads": b_heads.astype(np.float32),
+        "num_festivals": np.array(state_dict["fc_festival.weight"].shape[0]),
+    }
+
+
+def source_digest(model_path) -> str:
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def exported_digest(npz_path):
+    """SHA-256 of the .pth an .npz was exported from; "" for exports that predate it, None if unreadable."""
+    try:
+        with np.load(npz_path) as data:
+            return str(data["source_sha256"]) if "source_sha256" in data.files else ""
+    except (OSError, ValueError):
+        return None
+
+
+def export_numpy_weights(model_path, npz_path, digest=None) -> None:
+    """Export lstm_model.pth to fused NumPy weights. This is the only step that needs torch."""
+    import torch
+
+    state_dict = torch.load(model_path, map_location="cpu")
+    fused = fuse_state_dict({name: tensor.numpy() for name, tensor in state_dict.items()})
+    fused["source_sha256"] = np.array(digest or source_digest(model_path))
+    tmp_path = f"{npz_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **fused)
+    os.replace(tmp_path, npz_path)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+class NumpyLSTMClassifier:
+    """Torch-free LSTMClassifier forward on fused weights.
+
+    Features may be a dense array or a SciPy sparse matrix; sparse TF-IDF rows
+    only touch the weight rows of their non-zero terms.
+    """
+
+    def __init__(self, weights: dict):
+        self.num_festivals = int(weights["num_festivals"])
+        self.hidden_size = weights["w_gates"].shape[1] // 3
+        self.input_size = weights["w_gates"].shape[0]
+        self.w_gates = weights["w_gates"]
+        self.b_gates = weights["b_gates"]
+        self.w_heads = weights["w_heads"]
+        self.b_heads = weights["b_heads"]
+
+    @classmethod
+    def from_npz(cls, npz_path) -> "NumpyLSTMClassifier":
+        with np.load(npz_path) as data:
+            weights = {name: data[name] for name in data.files}
+        return cls(weights)
+
+    def __call__(self, features):
+        hidden = self.hidden_size
+        gates = np.asarray(features @ self.w_gates) + self.b_gates
+        input_gate = _sigmoid(gates[:, :hidden])
+        cell_gate = np.tanh(gates[:, hidden:2 * hidden])
+        output_gate = _sigmoid(gates[:, 2 * hidden:])
+        h = output_gate * np.tanh(input_gate * cell_gate)
+
+        logits = h @ self.w_heads + self.b_heads
+        return logits[:, :self.num_festivals], logits[:, self.num_festivals:]
+
+
+def load_numpy_engine(npz_path, model_path) -> NumpyLSTMClassifier:
+    # Re-export whenever the .pth differs from the one the .npz was made from (e.g. after retraining).
+    # Without the .pth (an npz-only deployment) the .npz is used as shipped.
+    if os.path.exists(model_path):
+        digest = source_digest(model_path)
+        if exported_digest(npz_path) != digest:
+            logger.info("Exporting %s to %s", model_path, npz_path)
+            export_numpy_weights(model_path, npz_path, digest)
+    return NumpyLSTMClassifier.from_npz(npz_path)
+
+
+def check_parity(reference_engine, engine, features) -> dict:
+    """Max |logit difference| and the worst head's argmax agreement of ``engine`` against ``reference_engine``."""
+    reference = reference_engine(features)
+    outputs = engine(features)
+    return {
+        "max_abs_diff": max(float(np.abs(out - ref).max()) for out, ref in zip(outputs, reference)),
+        "argmax_agreement": min(
+            float((out.argmax(axis=1) == ref.argmax(axis=1)).mean()) for out, ref in zip(outputs, reference)
+        ),
+    }
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    parser = argparse.ArgumentParser(description="Export lstm_model.pth to NumPy and check parity against torch")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    from cultural_practices import app
+
+    rng = np.random.default_rng(0)
+    # Random sparse non-negative rows, L2-normalised like TF-IDF output
+    features = rng.random((args.samples, app.input_size), dtype=np.float32)
+    features *= rng.random(features.shape) < 0.1
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    features /= np.where(norms == 0, 1, norms)
+
+    report = check_parity(app.load_engine("torch"), app.load_engine("numpy"), features)
+    print(f"max |diff| = {report['max_abs_diff']:.2e}  argmax agreement = {report['argmax_agreement']:.4f}")
+
+    if report["max_abs_diff"] > args.tolerance:
+        sys.exit(f"numpy engine differs from torch by more than {args.tolerance}")
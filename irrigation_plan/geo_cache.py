@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars), ((lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2)
+
+
+def quantize(location, grid_deg):
+    """Snap (lat, lon) to the centre of its grid cell."""
+    lat, lon = location
+    return (
+        round(round(float(lat) / grid_deg) * grid_deg, 6),
+        round(round(float(lon) / grid_deg) * grid_deg, 6),
+    )
+
+
+class SQLiteStore:
+    """Persistent key -> (value, timestamp) store in a SQLite file, shared by every worker process.
+
+    Values are stored as JSON. Each put is a single-row upsert, so writers
+    never rewrite each other's entries.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        self._migrate_json()
+
+    def _connection(self):
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, fetched_at REAL)")
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _migrate_json(self) -> None:
+        # Caches written by the earlier JSON file store are imported once and kept as <path>.json.bak
+        try:
+            with open(self.path, "rb") as f:
+                if f.read(1) != b"{":
+                    return
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        os.replace(self.path, f"{self.path}.json.bak")
+        with self._db_lock:
+            db = self._connection()
+            db.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, fetched_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), fetched_at) for key, (value, fetched_at) in data.items()],
+            )
+            db.commit()
+        logger.info("Imported %d cache entries from the JSON file %s", len(data), self.path)
+
+    def get(self, key):
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT value, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def put(self, key, value, fetched_at) -> None:
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), fetched_at),
+            )
+            db.commit()
+
+
+class GeoTTLCache:
+    """TTL cache for location lookups keyed on a coarse geo cell.
+
+    Locations are snapped to a ``grid_deg`` grid (or a geohash of
+    ``geohash_precision`` characters) and ``fetch`` is called with the cell
+    centre, so every farm in the cell shares one entry. Entries younger than
+    ``ttl`` are served directly; entries up to ``ttl + stale_ttl`` old are
+    served stale while one background refresh runs. Concurrent misses for the
+    same cell wait on a single fetch. ``ttl=None`` never expires.
+    """
+
+    def __init__(self, fetch, ttl=600, stale_ttl=0, grid_deg=0.1, geohash_precision=None,
+                 max_entries=100000, store=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.grid_deg = grid_deg
+        self.geohash_precision = geohash_precision
+        self.max_entries = max_entries
+        self.store = store
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._refreshing = set()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def cell(self, location):
+        """Return (cache key, cell centre) for a location."""
+        if self.geohash_precision:
+            return geohash(float(location[0]), float(location[1]), self.geohash_precision)
+        centre = quantize(location, self.grid_deg)
+        return f"{centre[0]},{centre[1]}", centre
+
+    def _age(self, fetched_at):
+        return time.time() - fetched_at
+
+    def _lookup(self, key):
+        # Called with self._lock held; memory only, the persistent store is read outside the lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _load(self, key):
+        """Read ``key`` from the persistent store without holding the cache lock."""
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            current = self._entries.get(key)
+            # A fetch may have landed while the disk read ran; keep whichever is newer
+            if current is not None and current[1] >= entry[1]:
+                return current
+            self._remember(key, *entry)
+        return entry
+
+    def _remember(self, key, value, fetched_at) -> None:
+        self._entries[key] = (value, fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store(self, key, value) -> None:
+        fetched_at = time.time()
+        with self._lock:
+            self._remember(key, value, fetched_at)
+        if self.store is not None:
+            self.store.put(key, value, fetched_at)
+
+    def get(self, location):
+        key, centre = self.cell(location)
+        with self._lock:
+            entry = self._lookup(key)
+        if entry is None and self.store is not None:
+            entry = self._load(key)
+
+        with self._lock:
+            if entry is None:
+                # Filled by a fetch that finished since the first look
+                entry = self._lookup(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = self._age(fetched_at)
+                if self.ttl is None or age < self.ttl:
+                    self._counters["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._counters["stale_hits"] += 1
+                    self._refresh_in_background(key, centre)
+                    return value
+
+            self._counters["misses"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self.fetch(centre)
+            self._store(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, centre) -> None:
+        # Called with self._lock held
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._store(key, self.fetch(centre))
+                with self._lock:
+                    self._counters["refreshes"] += 1
+            except Exception as e:
+                with self._lock:
+                    self._counters["refresh_errors"] += 1
+                logger.warning("Background refresh failed for %s: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"geo-cache-refresh-{key}", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "refreshing": len(self._refreshing)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
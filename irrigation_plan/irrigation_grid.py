@@ -0,0 +1,250 @@
+"""Water-requirement raster over a bounding box, written to a memory-mapped file.
+
+Weather is fetched only on a coarse grid of nodes (through the weather cache)
+and bilinearly interpolated to every cell. calculate_irrigation() then runs
+vectorized over tiles of rows, so memory stays bounded however large the
+grid is. No LLM is involved.
+
+File layout: a HEADER_SIZE-byte header (see HEADER_FORMAT) followed by
+rows x cols little-endian float32 values in L/m², C order. Row 0 is the
+northernmost row and column 0 the westernmost; the value at (row, col)
+is for the cell centred at (max_lat - (row + 0.5) * resolution,
+min_lon + (col + 0.5) * resolution).
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from irrigation_plan.irrigation_recommender import (
+    BATCH_WEATHER_WORKERS,
+    DEFAULT_SOIL_TYPE,
+    calculate_irrigation,
+    encode_soil_types,
+    get_weather_data,
+)
+from common.metrics import stage_timer
+
+MAGIC = b"IRRGRID1"
+# magic, header size, rows, cols, min_lat, min_lon, max_lat, max_lon, resolution, coarse resolution, created
+HEADER_FORMAT = "<8sIIIddddddd"
+HEADER_SIZE = 128
+DTYPE = np.dtype("<f4")
+
+IRRIGATION_GRID_TILE_ROWS = int(os.getenv("IRRIGATION_GRID_TILE_ROWS", "256"))
+IRRIGATION_GRID_COARSE_RESOLUTION = float(os.getenv("IRRIGATION_GRID_COARSE_RESOLUTION", "0.25"))
+
+WEATHER_FIELDS = ("temp", "humidity", "rain", "wind_speed")
+
+GridHeader = namedtuple(
+    "GridHeader",
+    "rows cols min_lat min_lon max_lat max_lon resolution coarse_resolution created",
+)
+
+
+def grid_shape(bbox, resolution):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if not (min_lat < max_lat and min_lon < max_lon):
+        raise ValueError("bbox must be [min_lat, min_lon, max_lat, max_lon] with min < max")
+    if resolution <= 0:
+        raise ValueError("resolution must be positive")
+    rows = int(np.ceil(round((max_lat - min_lat) / resolution, 9)))
+    cols = int(np.ceil(round((max_lon - min_lon) / resolution, 9)))
+    return rows, cols
+
+
+def coarse_nodes(low, high, step):
+    """Node coordinates covering [low, high] at ``step`` spacing, always including both ends."""
+    count = max(2, int(np.ceil(round((high - low) / step, 9))) + 1)
+    return np.linspace(low, high, count)
+
+
+def fetch_weather_grid(node_lats, node_lons, weather_fn=get_weather_data, workers=BATCH_WEATHER_WORKERS):
+    """Weather at every (lat, lon) node as a (len(node_lats), len(node_lons), 4) array.
+
+    Nodes whose fetch fails are filled with the mean of the others.
+    """
+    locations = [(float(lat), float(lon)) for lat in node_lats for lon in node_lons]
+
+    def fetch(location):
+        try:
+            weather = weather_fn(location)
+            return [weather[field] for field in WEATHER_FIELDS]
+        except Exception:
+            return [np.nan] * len(WEATHER_FIELDS)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(locations)))) as pool:
+        values = np.array(list(pool.map(fetch, locations)), dtype=np.float64)
+
+    missing = np.isnan(values).any(axis=1)
+    if missing.all():
+        raise RuntimeError("Failed to fetch weather data for every grid node")
+    if missing.any():
+        values[missing] = values[~missing].mean(axis=0)
+    return values.reshape(len(node_lats), len(node_lons), len(WEATHER_FIELDS)), int(missing.sum())
+
+
+def _axis_weights(nodes, points):
+    # Index of the node below each point and the weight of the node above it
+    step = nodes[1] - nodes[0]
+    position = np.clip((points - nodes[0]) / step, 0, len(nodes) - 1)
+    low = np.minimum(position.astype(np.intp), len(nodes) - 2)
+    return low, (position - low)[..., None]
+
+
+def bilinear(node_lats, node_lons, node_values, lats, lons):
+    """Interpolate (Ny, Nx, F) node values to the lats x lons grid, returning (len(lats), len(lons), F)."""
+    i0, wy = _axis_weights(node_lats, lats)
+    j0, wx = _axis_weights(node_lons, lons)
+    wy = wy[:, None, :]
+    wx = wx[None, :, :]
+    v00 = node_values[i0][:, j0]
+    v01 = node_values[i0][:, j0 + 1]
+    v10 = node_values[i0 + 1][:, j0]
+    v11 = node_values[i0 + 1][:, j0 + 1]
+    return (v00 * (1 - wx) + v01 * wx) * (1 - wy) + (v10 * (1 - wx) + v11 * wx) * wy
+
+
+def _write_header(f, header: GridHeader) -> None:
+    packed = struct.pack(HEADER_FORMAT, MAGIC, HEADER_SIZE, *header)
+    f.write(packed.ljust(HEADER_SIZE, b"\0"))
+
+
+def compute_grid(bbox, resolution, path, soil_type=DEFAULT_SOIL_TYPE,
+                 coarse_resolution=IRRIGATION_GRID_COARSE_RESOLUTION, tile_rows=IRRIGATION_GRID_TILE_ROWS,
+                 weather_fn=get_weather_data) -> dict:
+    """Write the water-requirement raster for ``bbox`` at ``resolution`` degrees to ``path``.
+
+    The file is written under a temporary name and renamed when complete, so
+    readers never see a partial grid.
+    """
+    start = time.perf_counter()
+    min_lat, min_lon, max_lat, max_lon = bbox
+    rows, cols = grid_shape(bbox, resolution)
+    header = GridHeader(rows, cols, min_lat, min_lon, max_lat, max_lon, resolution, coarse_resolution, time.time())
+
+    # Descending latitudes, so node row 0 is north like the raster
+    node_lats = coarse_nodes(min_lat, max_lat, coarse_resolution)[::-1].copy()
+    node_lons = coarse_nodes(min_lon, max_lon, coarse_resolution)
+    with stage_timer("grid_weather"):
+        node_values, failed_nodes = fetch_weather_grid(node_lats, node_lons, weather_fn=weather_fn)
+    # _axis_weights wants ascending nodes: flip latitude into "distance south of max_lat"
+    node_offsets = max_lat - node_lats
+
+    soil_code = encode_soil_types([soil_type])[0]
+    col_lons = min_lon + (np.arange(cols) + 0.5) * resolution
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        _write_header(f, header)
+        f.truncate(HEADER_SIZE + rows * cols * DTYPE.itemsize)
+
+    total = 0.0
+    low = np.inf
+    high = -np.inf
+    try:
+        values = np.memmap(tmp_path, dtype=DTYPE, mode="r+", offset=HEADER_SIZE, shape=(rows, cols))
+        with stage_timer("grid_compute"):
+            for r0 in range(0, rows, tile_rows):
+                r1 = min(rows, r0 + tile_rows)
+                row_offsets = (np.arange(r0, r1) + 0.5) * resolution
+                weather = bilinear(node_offsets, node_lons, node_values, row_offsets, col_lons)
+                tile = calculate_irrigation(
+                    soil_code, weather[..., 0], weather[..., 1], weather[..., 2], weather[..., 3]
+                ).astype(DTYPE)
+                values[r0:r1] = tile
+                total += float(tile.sum(dtype=np.float64))
+                low = min(low, float(tile.min()))
+                high = max(high, float(tile.max()))
+        values.flush()
+        del values
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {
+        "path": path,
+        "rows": rows,
+        "cols": cols,
+        "cells": rows * cols,
+        "bbox": [min_lat, min_lon, max_lat, max_lon],
+        "resolution": resolution,
+        "coarse_resolution": coarse_resolution,
+        "weather_nodes": int(node_values.shape[0] * node_values.shape[1]),
+        "failed_weather_nodes": failed_nodes,
+        "soil_type": soil_type,
+        "min_liters_per_m2": low,
+        "max_liters_per_m2": high,
+        "mean_liters_per_m2": total / (rows * cols),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def read_header(path) -> GridHeader:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    fields = struct.unpack_from(HEADER_FORMAT, raw)
+    if fields[0] != MAGIC:
+        raise ValueError(f"{path} is not an irrigation grid")
+    if fields[1] != HEADER_SIZE:
+        raise ValueError(f"Unsupported grid header size {fields[1]}")
+    return GridHeader(*fields[2:])
+
+
+def open_grid(path):
+    """Return (header, read-only memmap of shape (rows, cols)); pages are read only when touched."""
+    header = read_header(path)
+    values = np.memmap(path, dtype=DTYPE, mode="r", offset=HEADER_SIZE, shape=(header.rows, header.cols))
+    return header, values
+
+
+def cell_index(header: GridHeader, lat, lon):
+    if not (header.min_lat <= lat <= header.max_lat and header.min_lon <= lon <= header.max_lon):
+        raise ValueError("Point outside the grid")
+    row = min(header.rows - 1, int((header.max_lat - lat) / header.resolution))
+    col = min(header.cols - 1, int((lon - header.min_lon) / header.resolution))
+    return row, col
+
+
+def value_at(path, lat, lon) -> float:
+    header, values = open_grid(path)
+    row, col = cell_index(header, lat, lon)
+    return float(values[row, col])
+
+
+def read_window(path, bbox):
+    """Values for the cells overlapping ``bbox`` (north row first), read without loading the whole grid."""
+    header, values = open_grid(path)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    top, left = cell_index(header, min(max_lat, header.max_lat), max(min_lon, header.min_lon))
+    bottom, right = cell_index(header, max(min_lat, header.min_lat), min(max_lon, header.max_lon))
+    return np.array(values[top:bottom + 1, left:right + 1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute an irrigation-requirement grid for a bounding box")
+    parser.add_argument("min_lat", type=float)
+    parser.add_argument("min_lon", type=float)
+    parser.add_argument("max_lat", type=float)
+    parser.add_argument("max_lon", type=float)
+    parser.add_argument("--resolution", type=float, default=0.01, help="cell size in degrees")
+    parser.add_argument("--coarse-resolution", type=float, default=IRRIGATION_GRID_COARSE_RESOLUTION,
+                        help="weather node spacing in degrees")
+    parser.add_argument("--soil-type", default=DEFAULT_SOIL_TYPE)
+    parser.add_argument("--output", default="irrigation.grid")
+    args = parser.parse_args()
+
+    summary = compute_grid(
+        (args.min_lat, args.min_lon, args.max_lat, args.max_lon), args.resolution, args.output,
+        soil_type=args.soil_type, coarse_resolution=args.coarse_resolution,
+    )
+    for key, value in summary.items():
+        print(f"{key}: {value}")
@@ -1,23 +1,74 @@
 import sys
 import os
+import logging
 from dotenv import load_dotenv
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'voice_assistant')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from model_classes import LLMModel
+from irrigation_plan.geo_cache import GeoTTLCache, SQLiteStore
+from irrigation_plan.plan_cache import PlanCache
+from irrigation_plan.soil import DEFAULT_BASE_WATER, DEFAULT_SOIL_TYPE, SOIL_BASE_WATER
+from common import http_client
+from common.metrics import timed
 
-model = LLMModel()
+logger = logging.getLogger(__name__)
+
+# Created on first use; models.py injects the shared instance through set_model()
+model = None
+_model_lock = threading.Lock()
+
+def set_model(llm_model):
+    global model
+    model = llm_model
+
+def get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                model = LLMModel()
+    return model
 
 load_dotenv()
 
-WEATHER_BASE_URL = os.getenv("WEATHER_BASE_URL")
+# Overridable so benchmarks can point at a local stub instead of OpenWeather
+WEATHER_BASE_URL = os.getenv("WEATHER_BASE_URL") or "https://api.openweathermap.org/data/2.5"
+GEO_BASE_URL = os.getenv("GEO_BASE_URL") or "http://api.openweathermap.org/geo/1.0"
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 
-def get_weather_data(location):
+# Weather and place names are cached per geo cell: nearby farms share one lookup.
+# *_GEOHASH_PRECISION, when set, replaces the lat/lon grid with geohash cells.
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "3600"))
+WEATHER_CACHE_GRID_DEG = float(os.getenv("WEATHER_CACHE_GRID_DEG", "0.1"))
+WEATHER_CACHE_GEOHASH_PRECISION = int(os.getenv("WEATHER_CACHE_GEOHASH_PRECISION", "0"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_CACHE_GRID_DEG = float(os.getenv("GEOCODE_CACHE_GRID_DEG", "0.01"))
+GEOCODE_CACHE_GEOHASH_PRECISION = int(os.getenv("GEOCODE_CACHE_GEOHASH_PRECISION", "0"))
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")
+BATCH_WEATHER_WORKERS = int(os.getenv("BATCH_WEATHER_WORKERS", "8"))
+
+# Generated plans are reused for the same crop/stage/soil/place under similar weather
+PLAN_CACHE = os.getenv("PLAN_CACHE", "1") == "1"
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "1024"))
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", str(6 * 3600)))
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "")
+PLAN_CACHE_MAX_DISK_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_DISK_ENTRIES", "100000"))
+PLAN_CACHE_TEMP_RESOLUTION = float(os.getenv("PLAN_CACHE_TEMP_RESOLUTION", "1"))
+PLAN_CACHE_HUMIDITY_RESOLUTION = float(os.getenv("PLAN_CACHE_HUMIDITY_RESOLUTION", "5"))
+PLAN_CACHE_RAIN_RESOLUTION = float(os.getenv("PLAN_CACHE_RAIN_RESOLUTION", "0.5"))
+PLAN_CACHE_WIND_RESOLUTION = float(os.getenv("PLAN_CACHE_WIND_RESOLUTION", "1"))
+
+@timed("weather_fetch")
+def fetch_weather_data(location):
     lat, lon = location
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={WEATHER_API_KEY}"
+    url = f"{WEATHER_BASE_URL}/weather?lat={lat}&lon={lon}&appid={WEATHER_API_KEY}"
     
-    response = requests.get(url)
+    response = http_client.get(url)
     if response.status_code == 200:
         data = response.json()
         weather_info = {
@@ -26,32 +77,45 @@ def get_weather_data(location):
             "rain": data.get("rain", {}).get("1h", 0),
             "wind_speed": data["wind"]["speed"]
         }
-        print(f"[DEBUG] Weather Data for {location}: {weather_info}")  # Debug print
+        logger.debug("Weather data for %s: %s", location, weather_info)
         return weather_info
     else:
         raise Exception(f"Failed to fetch weather data: {response.status_code}")
 
 
+# Soil lookup table: code i -> base water, with the last code reserved for unknown soils
+SOIL_CODES = {soil: code for code, soil in enumerate(SOIL_BASE_WATER)}
+UNKNOWN_SOIL_CODE = len(SOIL_CODES)
+BASE_WATER_TABLE = np.array([*SOIL_BASE_WATER.values(), DEFAULT_BASE_WATER], dtype=np.float64)
+
+
+def encode_soil_types(soil_types):
+    """Map soil names to lookup-table codes, resolving each distinct name only once."""
+    names, inverse = np.unique(np.asarray(soil_types, dtype=str), return_inverse=True)
+    codes = np.array([SOIL_CODES.get(name.lower(), UNKNOWN_SOIL_CODE) for name in names], dtype=np.intp)
+    return codes[inverse]
+
 
 def calculate_irrigation(soil_type, temp, humidity, rain, wind_speed):
-    base_water = {
-        "sandy": 20,
-        "sandy loam": 17,
-        "loamy": 14,
-        "silt loam": 12,
-        "clay loam": 10,
-        "clay": 9,
-        "peaty": 16,
-        "volcanic loam": 14,
-        "silty clay loam": 12,
-        "sandy clay loam": 13,
-        "silty": 10,
-        "clayey silt": 9,
-        "alluvial loam": 12,
-        "chernozem": 14,
-        "glacial till and rocky": 8,
-        "rocky and sandy": 6
-    }.get(soil_type.lower(), 12)  # Default to 12L/m² if unknown
+    """Daily water requirement in L/m².
+
+    Takes either scalars or equal-length arrays; ``soil_type`` may be soil names
+    or codes from encode_soil_types(). Array inputs return an array.
+    """
+    scalar = all(np.ndim(v) == 0 for v in (soil_type, temp, humidity, rain, wind_speed))
+
+    soil_codes = np.asarray(soil_type)
+    if not np.issubdtype(soil_codes.dtype, np.integer):
+        if soil_codes.ndim == 0:
+            # encode_soil_types() returns shape (1,) for a single name; keep scalars 0-d
+            soil_codes = np.intp(SOIL_CODES.get(str(soil_type).lower(), UNKNOWN_SOIL_CODE))
+        else:
+            soil_codes = encode_soil_types(soil_codes)
+    base_water = BASE_WATER_TABLE[soil_codes]
+    temp = np.asarray(temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    rain = np.asarray(rain, dtype=np.float64)
+    wind_speed = np.asarray(wind_speed, dtype=np.float64)
 
     # **Evapotranspiration (ET) Factor Adjustments**
     temp_factor = 1 + (temp - 20) * 0.08  # 8% change per °C deviation from 20°C
@@ -60,16 +124,23 @@ def calculate_irrigation(soil_type, temp, humidity, rain, wind_speed):
 
     # **Final irrigation requirement**
     adjusted_water = base_water * temp_factor * humidity_factor * wind_factor - rain
-    final_water = max(5, round(adjusted_water, 1))  # Ensure a minimum of 5L/m²
+    final_water = np.maximum(5, np.round(adjusted_water, 1))  # Ensure a minimum of 5L/m²
+
+    if not scalar:
+        return final_water
 
-    # Debugging info
-    print(f"[DEBUG] {soil_type} Soil - Base Water: {base_water}L | Adjusted: {final_water}L")
-    print(f"[DEBUG] Factors - Temp: {temp_factor:.2f}, Humidity: {humidity_factor:.2f}, Wind: {wind_factor:.2f}, Rain Reduction: {rain}mm")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s soil - base water: %sL | adjusted: %sL", soil_type, base_water, final_water)
+        logger.debug(
+            "Factors - temp: %.2f, humidity: %.2f, wind: %.2f, rain reduction: %smm",
+            temp_factor, humidity_factor, wind_factor, rain
+        )
 
-    return final_water
+    return final_water.item()
 
 
 def generate_irrigation_plan(crop_type, growth_stage, soil_type, weather, exact_location):
+    # The plan is computed and prompted from the real readings; only the cache key uses bucketed weather
     irrigation_liters = calculate_irrigation(
         soil_type, weather["temp"], weather["humidity"], weather["rain"], weather["wind_speed"]
     )
@@ -84,26 +155,170 @@ def generate_irrigation_plan(crop_type, growth_stage, soil_type, weather, exact_
 
     text = f"Exact Location to be mentioned: {exact_location}. Generate an irrigation plan with minimal water wastage for {crop_type}. Method to be mentioned: Give the most suitable, most efficient technology for irrigation. For {crop_type} in the {growth_stage} stage growing in {soil_type} soil temperature: {weather['temp']}K, humidity: {weather['humidity']} rain: {weather['rain']}mm, wind: {weather['wind_speed']}m/s"
     
-    result = model.get_response(text, long_context=True)
+    if plan_cache is None:
+        return get_model().get_response(text, long_context=True)
 
-    return result
+    key = plan_cache.make_key(crop_type, growth_stage, soil_type, exact_location, weather)
+    return plan_cache.get_or_compute(key, lambda: get_model().get_response(text, long_context=True))
 
-def get_location_from_coords(location):
+@timed("reverse_geocode")
+def fetch_location_from_coords(location):
     lat, lon = location
     limit = 4
-    API_URL = f"http://api.openweathermap.org/geo/1.0/reverse?lat={lat}&lon={lon}&limit={limit}&appid={WEATHER_API_KEY}"
-    response = requests.get(API_URL)
+    API_URL = f"{GEO_BASE_URL}/reverse?lat={lat}&lon={lon}&limit={limit}&appid={WEATHER_API_KEY}"
+    response = http_client.get(API_URL)
     exact_location = response.json()[0]['name']
     return exact_location
+
+weather_cache = GeoTTLCache(
+    fetch_weather_data,
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE_TTL,
+    grid_deg=WEATHER_CACHE_GRID_DEG,
+    geohash_precision=WEATHER_CACHE_GEOHASH_PRECISION or None,
+)
+geocode_cache = GeoTTLCache(
+    fetch_location_from_coords,
+    ttl=GEOCODE_CACHE_TTL,
+    grid_deg=GEOCODE_CACHE_GRID_DEG,
+    geohash_precision=GEOCODE_CACHE_GEOHASH_PRECISION or None,
+    store=SQLiteStore(GEOCODE_CACHE_PATH) if GEOCODE_CACHE_PATH else None,
+)
+plan_cache = PlanCache(
+    max_entries=PLAN_CACHE_SIZE,
+    ttl=PLAN_CACHE_TTL,
+    path=PLAN_CACHE_PATH or None,
+    max_disk_entries=PLAN_CACHE_MAX_DISK_ENTRIES,
+    temp_resolution=PLAN_CACHE_TEMP_RESOLUTION,
+    humidity_resolution=PLAN_CACHE_HUMIDITY_RESOLUTION,
+    rain_resolution=PLAN_CACHE_RAIN_RESOLUTION,
+    wind_resolution=PLAN_CACHE_WIND_RESOLUTION,
+) if PLAN_CACHE else None
+
+def get_weather_data(location):
+    return weather_cache.get(location)
+
+def get_location_from_coords(location):
+    return geocode_cache.get(location)
+
+def cache_stats():
+    stats = {"weather": weather_cache.stats(), "geocode": geocode_cache.stats()}
+    if plan_cache is not None:
+        stats["plan"] = plan_cache.stats()
+    return stats
     
 
 def irrigation_recommendation_engine(crop_type, growth_stage, location, exact_location):
     weather = get_weather_data(location)
     # soil_type = get_soil_data(location)
-    soil_type = "loamy"
+    soil_type = DEFAULT_SOIL_TYPE
     plan = generate_irrigation_plan(crop_type, growth_stage, soil_type, weather, exact_location)
     return plan
 
+def validate_location(location):
+    """Return ``location`` as a (lat, lon) float pair, or raise ValueError."""
+    if not isinstance(location, (list, tuple)) or len(location) != 2:
+        raise ValueError("location must be [lat, lon]")
+    try:
+        lat, lon = float(location[0]), float(location[1])
+    except (TypeError, ValueError):
+        raise ValueError("location must be [lat, lon] numbers") from None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("location is out of range")
+    return lat, lon
+
+def irrigation_plan_batch(plots, include_narrative=False):
+    """Numeric irrigation schedule for many plots at once.
+
+    Each plot is a dict with crop, stage, location ([lat, lon]) and an optional
+    soil_type; a malformed plot raises ValueError before anything is fetched.
+    Weather is fetched once per weather-cache cell and the water requirement is
+    computed for all plots in one vectorized call. The LLM narrative is only
+    generated when include_narrative is set, concurrently on the same bounded
+    pool. A plot whose weather, place name or narrative fails gets an "error"
+    instead; the rest of the batch is unaffected.
+    """
+    if not plots:
+        return []
+
+    locations = []
+    for i, plot in enumerate(plots):
+        if not isinstance(plot, dict) or "location" not in plot:
+            raise ValueError(f"Plot {i} needs a location")
+        try:
+            locations.append(validate_location(plot["location"]))
+        except ValueError as e:
+            raise ValueError(f"Plot {i}: {e}") from None
+
+    cell_index = {}
+    cell_locations = []
+    plot_cells = np.empty(len(plots), dtype=np.intp)
+    for i, location in enumerate(locations):
+        key, _ = weather_cache.cell(location)
+        if key not in cell_index:
+            cell_index[key] = len(cell_locations)
+            cell_locations.append(location)
+        plot_cells[i] = cell_index[key]
+
+    def fetch(location):
+        try:
+            return get_weather_data(location), None
+        except Exception as e:
+            return None, str(e)
+
+    soil_types = [plot.get("soil_type") or DEFAULT_SOIL_TYPE for plot in plots]
+
+    def narrative(i, weather):
+        plot = plots[i]
+        try:
+            exact_location = get_location_from_coords(locations[i])
+            return generate_irrigation_plan(
+                plot.get("crop"), plot.get("stage"), soil_types[i], weather, exact_location
+            ), None
+        except Exception as e:
+            logger.warning("Irrigation plan for plot %d failed: %s", i, e)
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_WEATHER_WORKERS, len(plots)))) as pool:
+        cell_weather = list(pool.map(fetch, cell_locations))
+
+        fields = ("temp", "humidity", "rain", "wind_speed")
+        cell_values = np.full((len(cell_locations), len(fields)), np.nan)
+        for c, (weather, _) in enumerate(cell_weather):
+            if weather is not None:
+                cell_values[c] = [weather[field] for field in fields]
+        water = calculate_irrigation(encode_soil_types(soil_types), *cell_values[plot_cells].T)
+
+        narratives = {}
+        if include_narrative:
+            for i in range(len(plots)):
+                weather, _ = cell_weather[plot_cells[i]]
+                if weather is not None:
+                    narratives[i] = pool.submit(narrative, i, weather)
+
+        results = []
+        for i, plot in enumerate(plots):
+            weather, error = cell_weather[plot_cells[i]]
+            result = {
+                "crop": plot.get("crop"),
+                "stage": plot.get("stage"),
+                "location": plot["location"],
+                "soil_type": soil_types[i],
+            }
+            if error is not None:
+                result["error"] = f"Failed to fetch weather data: {error}"
+            else:
+                result["weather"] = weather
+                result["irrigation_liters_per_m2"] = float(water[i])
+                if i in narratives:
+                    plan, error = narratives[i].result()
+                    if error is not None:
+                        result["error"] = f"Failed to generate irrigation plan: {error}"
+                    else:
+                        result["irrigation_plan"] = plan
+            results.append(result)
+    return results
+
 if __name__ == "__main__":
     crop = "potatoes"
     stage = "vegetative"
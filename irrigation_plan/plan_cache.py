@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def bucket(value, resolution):
+    if not resolution:
+        return value
+    return round(round(float(value) / resolution) * resolution, 6)
+
+
+class PlanCache:
+    """LRU/TTL cache for generated irrigation plans.
+
+    Keys combine crop, stage, soil, location name and weather bucketed to the
+    configured resolutions, so nearby farms with near-identical conditions
+    share one generation. Entries can also be kept in a SQLite file
+    (``path``) to survive restarts; every ``prune_interval`` writes, expired
+    rows are deleted and the table is cut back to its ``max_disk_entries``
+    newest rows. Concurrent requests for the same key wait on a single
+    in-flight generation.
+    """
+
+    def __init__(self, max_entries=1024, ttl=6 * 3600, path=None, temp_resolution=1.0,
+                 humidity_resolution=5.0, rain_resolution=0.5, wind_resolution=1.0,
+                 max_disk_entries=100000, prune_interval=100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.prune_interval = prune_interval
+        self.resolutions = {
+            "temp": temp_resolution,
+            "humidity": humidity_resolution,
+            "rain": rain_resolution,
+            "wind_speed": wind_resolution,
+        }
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "pruned": 0}
+
+    def bucket_weather(self, weather) -> dict:
+        return {field: bucket(weather[field], resolution) for field, resolution in self.resolutions.items()}
+
+    def make_key(self, crop, stage, soil_type, location_name, weather) -> str:
+        payload = {
+            "crop": str(crop).strip().lower(),
+            "stage": str(stage).strip().lower(),
+            "soil": str(soil_type).strip().lower(),
+            "location": str(location_name).strip().lower(),
+            "weather": self.bucket_weather(weather),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _connection(self):
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_plans_created ON plans (created)")
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _disk_get(self, key):
+        if not self.path:
+            return None
+        with self._db_lock:
+            row = self._connection().execute("SELECT value, created FROM plans WHERE key = ?", (key,)).fetchone()
+        return row
+
+    def _disk_put(self, key, value, created) -> None:
+        if not self.path:
+            return
+        with self._db_lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO plans (key, value, created) VALUES (?, ?, ?)", (key, value, created))
+            self._disk_writes += 1
+            if self._disk_writes % self.prune_interval == 0:
+                self._counters["pruned"] += self._prune(db)
+            db.commit()
+
+    def _prune(self, db) -> int:
+        # Called with self._db_lock held; committed with the write that triggered it
+        deleted = 0
+        if self.ttl is not None:
+            deleted += db.execute("DELETE FROM plans WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        if self.max_disk_entries is not None:
+            deleted += db.execute(
+                "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            ).rowcount
+        return deleted
+
+    def _fresh(self, created) -> bool:
+        return self.ttl is None or time.time() - created < self.ttl
+
+    def _remember(self, key, value, created) -> None:
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[1]):
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+
+        entry = self._disk_get(key)
+        if entry is not None and self._fresh(entry[1]):
+            with self._lock:
+                self._remember(key, *entry)
+                self._counters["disk_hits"] += 1
+            return entry[0]
+        return None
+
+    def put(self, key, value) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+        self._disk_put(key, value, created)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            self._counters["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "inflight": len(self._inflight)}
@@ -0,0 +1,22 @@
+# Soil tables shared by the irrigation model and the local NER gazetteer; keep this module import-free
+
+SOIL_BASE_WATER = {
+    "sandy": 20,
+    "sandy loam": 17,
+    "loamy": 14,
+    "silt loam": 12,
+    "clay loam": 10,
+    "clay": 9,
+    "peaty": 16,
+    "volcanic loam": 14,
+    "silty clay loam": 12,
+    "sandy clay loam": 13,
+    "silty": 10,
+    "clayey silt": 9,
+    "alluvial loam": 12,
+    "chernozem": 14,
+    "glacial till and rocky": 8,
+    "rocky and sandy": 6
+}
+DEFAULT_BASE_WATER = 12  # Default to 12L/m² if unknown
+DEFAULT_SOIL_TYPE = "loamy"
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+_NOT_LOADED = object()
+
+
+class ModelRegistry:
+    """Lazily constructs named components on first use and records how long each took.
+
+    A factory receives the registry, so components can share others through
+    ``registry.get(...)`` (e.g. one LLMModel for every consumer).
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+
+    def register(self, name, factory) -> None:
+        self._factories[name] = factory
+        self._instances[name] = _NOT_LOADED
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        instance = self._instances[name]
+        if instance is not _NOT_LOADED:
+            return instance
+
+        with self._locks[name]:
+            instance = self._instances[name]
+            if instance is not _NOT_LOADED:
+                return instance
+
+            logger.info("Loading %s", name)
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name](self)
+            except Exception as e:
+                self._errors[name] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self._load_seconds[name] = time.perf_counter() - start
+            self._errors.pop(name, None)
+            self._instances[name] = instance
+            logger.info("Loaded %s in %.2fs", name, self._load_seconds[name])
+            return instance
+
+    def is_loaded(self, name) -> bool:
+        return self._instances[name] is not _NOT_LOADED
+
+    def names(self) -> list:
+        return list(self._factories)
+
+    def warm_up(self, names=None, background: bool = False):
+        """Load ``names`` (default: everything) in parallel, then log the startup report.
+
+        With ``background=True`` this returns the warm-up thread immediately.
+        """
+        names = list(names or self._factories)
+
+        def load(name):
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception("Failed to load %s", name)
+
+        def run():
+            threads = [threading.Thread(target=load, args=(name,), name=f"warm-up-{name}") for name in names]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.log_report()
+
+        if background:
+            thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+            thread.start()
+            return thread
+        run()
+        return None
+
+    def close(self) -> None:
+        """Close every loaded component that has a close() method (batchers, history stores).
+
+        Components close in reverse registration order, so one that writes to
+        another while draining (the summary memory into the history store)
+        closes first.
+        """
+        for name, instance in reversed(list(self._instances.items())):
+            # Module components (e.g. the irrigation recommender) have nothing to close
+            if instance is _NOT_LOADED or isinstance(instance, types.ModuleType):
+                continue
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning("Failed to close %s: %s", name, e)
+
+    def report(self) -> dict:
+        # Load times include any dependencies a component pulled in through get()
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._factories
+        }
+
+    def log_report(self) -> None:
+        lines = ["Startup report:"]
+        for name, entry in self.report().items():
+            if entry["error"]:
+                status = f"failed ({entry['error']})"
+            elif entry["loaded"]:
+                status = f"{entry['load_seconds']:.2f}s"
+            else:
+                status = "not loaded"
+            lines.append(f"  {name:20s} {status}")
+        logger.info("\n".join(lines))
@@ -1,79 +1,468 @@
-from flask import Flask, request, jsonify
+import os
+import json
+import time
+import logging
+import uuid
+from dotenv import load_dotenv
+from flask import Flask, Response, abort, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS  # Add this import
-from voice_assistant.voice_assistant import VoiceAssistant
-from cultural_modern.water_conservation_analyzer import WaterConservationAnalyzer
-from irrigation_plan.irrigation_recommender import irrigation_recommendation_engine, get_location_from_coords
+from model_registry import ModelRegistry
+from common import metrics
+# Bind the voice_assistant package now: irrigation_plan and cultural_modern put the voice_assistant
+# directory on sys.path, after which voice_assistant/voice_assistant.py would shadow the package
+import voice_assistant  # noqa: F401
 
-from cultural_practices.app import predict_festival_and_practice
+load_dotenv()
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+)
 
 app = Flask(__name__)
 CORS(app)
 
-assistant_model = VoiceAssistant()
-water_conservation_analyzer = WaterConservationAnalyzer()
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Label by route pattern, not raw path, to keep the series count bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe_request(endpoint, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+# Every component is built on first use, so a worker only pays for what its routes touch
+registry = ModelRegistry()
+
+def load_llm(registry):
+    from voice_assistant.model_classes import LLMModel
+    from voice_assistant.llm_router import LLMRouter, fallback_model_ids
+    # LLM_ROUTER=1 or any LLM_FALLBACK_MODEL_IDS adds deadlines, hedging and circuit breaking
+    fallback_ids = fallback_model_ids()
+    if not fallback_ids and os.getenv("LLM_ROUTER", "0") != "1":
+        return LLMModel()
+    return LLMRouter([LLMModel()] + [LLMModel(model_id) for model_id in fallback_ids])
+
+# Gridded water-requirement maps: where the files go and the largest grid one request may ask for
+IRRIGATION_GRID_DIR = os.getenv("IRRIGATION_GRID_DIR", "irrigation_grids")
+IRRIGATION_GRID_MAX_CELLS = int(os.getenv("IRRIGATION_GRID_MAX_CELLS", str(25_000_000)))
+
+DEFAULT_SESSION_ID = "default"
+
+def session_id_from(data=None):
+    # Every endpoint takes an optional session_id, in the JSON body or the query string
+    if data and data.get('session_id'):
+        return str(data['session_id'])
+    return request.args.get('session_id', DEFAULT_SESSION_ID)
+
+def load_history_store(registry):
+    # HISTORY_BACKEND=sqlite shares history between worker processes and across restarts
+    if os.getenv("HISTORY_BACKEND", "memory") == "sqlite":
+        from voice_assistant.sqlite_history import SQLiteHistoryStore
+        compact_interval = os.getenv("HISTORY_COMPACT_INTERVAL")
+        max_age = os.getenv("HISTORY_MAX_AGE")
+        return SQLiteHistoryStore(
+            os.getenv("HISTORY_DB_PATH", "conversation_history.db"),
+            compact_interval=float(compact_interval) if compact_interval else None,
+            max_turns_per_session=int(os.getenv("SESSION_MAX_TURNS", "50")),
+            max_age=float(max_age) if max_age else None,
+        )
+    from voice_assistant.session_store import SessionStore
+    return SessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+        idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "3600")),
+        max_turns=int(os.getenv("SESSION_MAX_TURNS", "50")),
+    )
+
+def refresh_water_analysis(session_id):
+    # Keeps /water_analysis answers ready: each new turn recomputes the session's analysis in the background
+    registry.get("water_analyzer").refresh_in_background(session_id)
+
+def load_conversation_memory(registry):
+    # MEMORY_MODE=summary: recent turns verbatim plus a background-updated summary, within MEMORY_TOKEN_BUDGET
+    if os.getenv("MEMORY_MODE", "window") != "summary":
+        return None
+    from voice_assistant.summary_memory import RollingSummaryMemory
+    return RollingSummaryMemory(registry.get("llm"), registry.get("history_store"))
+
+def load_voice_assistant(registry):
+    from voice_assistant.voice_assistant import VoiceAssistant
+    refresh_on_turn = os.getenv("WATER_ANALYSIS_REFRESH_ON_TURN", "1") == "1"
+    return VoiceAssistant(
+        llm_model=registry.get("llm"),
+        session_store=registry.get("history_store"),
+        on_turn=refresh_water_analysis if refresh_on_turn else None,
+        memory=registry.get("conversation_memory"),
+    )
+
+def conversation_history(session_id=DEFAULT_SESSION_ID):
+    from voice_assistant.voice_assistant import format_history
+    return format_history(registry.get("history_store").get_messages(session_id))
+
+def load_water_analyzer(registry):
+    from cultural_modern.water_conservation_analyzer import WaterConservationAnalyzer
+    # WATER_ANALYSIS_HISTORY_URL switches to fetching history from a remote assistant over HTTP
+    history_url = os.getenv("WATER_ANALYSIS_HISTORY_URL")
+    return WaterConservationAnalyzer(
+        llm_model=registry.get("llm"),
+        history_provider=None if history_url else conversation_history,
+        history_url=history_url,
+        memory=registry.get("conversation_memory"),
+    )
+
+def load_irrigation(registry):
+    from irrigation_plan import irrigation_recommender
+    irrigation_recommender.set_model(registry.get("llm"))
+    return irrigation_recommender
+
+def load_irrigation_grid(registry):
+    # No LLM is built for grids
+    from irrigation_plan import irrigation_grid
+    os.makedirs(IRRIGATION_GRID_DIR, exist_ok=True)
+    return irrigation_grid
+
+def load_festival_classifier(registry):
+    from cultural_practices import app as festival_classifier
+    return festival_classifier
+
+def load_festival_batcher(registry):
+    # Opt-in: coalesce concurrent /predict_festival_practice requests into one LSTM forward
+    if os.getenv("FESTIVAL_MICRO_BATCH", "0") != "1":
+        return None
+    from cultural_practices.micro_batcher import MicroBatcher
+    return MicroBatcher(
+        registry.get("festival_classifier").predict_festival_and_practice_batch,
+        max_wait_ms=float(os.getenv("FESTIVAL_MICRO_BATCH_WINDOW_MS", "3")),
+        max_batch_size=int(os.getenv("FESTIVAL_MICRO_BATCH_MAX_SIZE", "64")),
+    )
+
+def load_jobs(registry):
+    # Bounded pool for ?async=1 requests: JOB_WORKERS threads, JOB_QUEUE_LIMIT waiting, results kept JOB_RESULT_TTL
+    from common.jobs import build_job_manager
+    return build_job_manager()
+
+registry.register("llm", load_llm)
+registry.register("history_store", load_history_store)
+registry.register("conversation_memory", load_conversation_memory)
+registry.register("voice_assistant", load_voice_assistant)
+registry.register("water_analyzer", load_water_analyzer)
+registry.register("irrigation", load_irrigation)
+registry.register("irrigation_grid", load_irrigation_grid)
+registry.register("festival_classifier", load_festival_classifier)
+registry.register("festival_batcher", load_festival_batcher)
+registry.register("jobs", load_jobs)
+
+# MODEL_WARMUP=all or a comma-separated list of components to load in the background at startup
+warmup = os.getenv("MODEL_WARMUP", "")
+if warmup:
+    registry.warm_up(None if warmup == "all" else warmup.split(","), background=True)
+
+# MODEL_HANDLE_PREFETCH=1 builds every aiXplain model recorded on the last run in the background.
+# Off by default: components resolve their own models when the registry loads them, so a worker
+# that only serves /irrigation_plan never builds the ASR/NER/TTS handles
+if os.getenv("MODEL_HANDLE_PREFETCH", "0") == "1":
+    from voice_assistant import model_handles
+    model_handles.prefetch_in_background()
 
 @app.route('/')
 def home():
     return "Hello, Flask is running on port 7000!"
 
+@app.route('/startup_report', methods=['GET'])
+def startup_report():
+    return jsonify(registry.report())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/http_metrics', methods=['GET'])
+def http_metrics():
+    from common import http_client
+    return jsonify(http_client.host_metrics())
+
 @app.route('/assistant_response', methods=['POST'])
 def predict():
+    """Answer a recorded question with speech: {"audio_response": <clip location>}.
+
+    With the TTS cache on (TTS_CACHE=1, the default) the clip is downloaded into the cache
+    before the response is sent, and audio_response is a path on this server,
+    TTS_CACHE_URL_PREFIX/<sha256>.mp3 (by default /audio/<sha256>.mp3, served by cached_audio).
+    Clients must resolve it against this server's base URL. TTS_CACHE=0 returns the TTS
+    provider's URL directly, as before the cache, without waiting for the download.
+    """
     data = request.get_json()
     audio_path = data['audio_path']
-    audio_response = assistant_model.forward(audio_path=audio_path)
+    audio_response = registry.get("voice_assistant").forward(audio_path=audio_path, session_id=session_id_from(data))
 
     return jsonify({
         'audio_response': audio_response
     })
 
+@app.route('/assistant_response/stream', methods=['POST'])
+def predict_stream():
+    """Server-sent events: transcript, then audio / audio_error per sentence, then done.
+
+    With the aiXplain LLM (no streaming API) the answer is generated in full before
+    the first sentence goes to TTS; done.llm_streamed is false in that case.
+    """
+    data = request.get_json()
+    audio_path = data['audio_path']
+    session_id = session_id_from(data)
+    assistant = registry.get("voice_assistant")
+
+    def events():
+        for event in assistant.stream_forward(audio_path, session_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/audio/cache_stats', methods=['GET'])
+def audio_cache_stats():
+    from voice_assistant.tts_cache import get_tts_cache
+    tts_cache = get_tts_cache()
+    if tts_cache is None:
+        return jsonify({'tts_cache': False})
+    return jsonify({'tts_cache': True, **tts_cache.stats()})
+
+@app.route('/audio/<name>', methods=['GET'])
+def cached_audio(name):
+    # Serves the clips the TTS models return as /audio/<sha256>.mp3
+    from voice_assistant.tts_cache import get_tts_cache
+    tts_cache = get_tts_cache()
+    if tts_cache is None:
+        abort(404)
+    return send_from_directory(tts_cache.directory, name, max_age=86400)
+
 @app.route('/get_conversation_history', methods=['GET'])
 def history():
-    history = assistant_model.get_conversation_history()
-    data = []
-    for idx, message in enumerate(history):
-        if idx%2 == 0:
-            data.append({"User": message.content})
-        else:
-            data.append({"AI": message.content})
+    session_id = session_id_from()
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        return jsonify({
+            'history': conversation_history(session_id)
+        })
+
+    # Paginated: offset counts messages back from the newest, each page is in chronological order
+    from voice_assistant.voice_assistant import format_history
+    offset = request.args.get('offset', 0, type=int)
+    messages, total = registry.get("history_store").get_page(session_id, limit=limit, offset=offset)
+    next_offset = offset + len(messages)
     return jsonify({
-        'history': data
+        'history': format_history(messages),
+        'total': total,
+        'next_offset': next_offset if next_offset < total else None
     })
 
+def wants_async(data=None):
+    # ?async=1 or {"async": true}: answer 202 with a job ID instead of waiting for the LLM
+    if data and data.get('async'):
+        return True
+    return request.args.get('async', '0').lower() in ('1', 'true')
+
+def submit_job(kind, fn, *args):
+    from common.jobs import JobQueueFull
+    try:
+        job_id = registry.get("jobs").submit(kind, fn, *args)
+    except JobQueueFull:
+        return jsonify({'error': 'Too many queued jobs, retry later'}), 429, {'Retry-After': '5'}
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}'
+    }), 202, {'Location': f'/jobs/{job_id}'}
+
+def irrigation_plan_response(crop, stage, location):
+    irrigation = registry.get("irrigation")
+    exact_location = irrigation.get_location_from_coords(location)
+    
+    result = irrigation.irrigation_recommendation_engine(crop, stage, location, exact_location)
+    final_result = f'''
+    \n🌿 **Irrigation Plan:**\n
+    {result}
+    '''
+    return {
+        'irrigation_plan': final_result
+    }
+
 @app.route('/irrigation_plan', methods=['POST'])
 def irrigation_recommend():
     data = request.get_json()
     crop = data['crop']
     stage = data['stage']
     location = data['location']
-    exact_location = get_location_from_coords(location)
-    
-    result = irrigation_recommendation_engine(crop, stage, location, exact_location)
-    final_result = f'''
-    \n🌿 **Irrigation Plan:**\n
-    {result}
-    '''
+    if wants_async(data):
+        return submit_job("irrigation_plan", irrigation_plan_response, crop, stage, location)
+    return jsonify(irrigation_plan_response(crop, stage, location))
+
+@app.route('/irrigation_plan/batch', methods=['POST'])
+def irrigation_recommend_batch():
+    data = request.get_json()
+    plots = data.get('plots', [])
+    if not plots or not isinstance(plots, list):
+        return jsonify({'error': 'No plots provided'}), 400
+
+    try:
+        results = registry.get("irrigation").irrigation_plan_batch(
+            plots, include_narrative=bool(data.get('include_narrative', False))
+        )
+    except ValueError as e:
+        # Malformed plots are rejected before any weather or LLM call
+        return jsonify({'error': str(e)}), 400
     return jsonify({
-        'irrigation_plan': final_result
+        'irrigation_plans': results
     })
 
-@app.route("/water_analysis", methods=['GET'])
-def water_analyse():
-    # data = request.json
-    result = water_conservation_analyzer.analyze_practices()
+@app.route('/irrigation_plan/cache_stats', methods=['GET'])
+def irrigation_cache_stats():
+    return jsonify(registry.get("irrigation").cache_stats())
+
+def irrigation_grid_response(grid_id, bbox, resolution, soil_type, coarse_resolution):
+    irrigation_grid = registry.get("irrigation_grid")
+    path = os.path.join(IRRIGATION_GRID_DIR, f"{grid_id}.grid")
+    summary = irrigation_grid.compute_grid(
+        bbox, resolution, path, soil_type=soil_type, coarse_resolution=coarse_resolution
+    )
+    del summary['path']
+    return {
+        'grid_id': grid_id,
+        'grid_url': f'/irrigation_grid/{grid_id}',
+        'download_url': f'/irrigation_grid/{grid_id}/download',
+        **summary
+    }
+
+def irrigation_grid_path(grid_id):
+    # IDs are uuid4 hex; anything else would be a path outside the grid directory
+    if len(grid_id) != 32 or any(c not in '0123456789abcdef' for c in grid_id):
+        abort(404)
+    path = os.path.join(IRRIGATION_GRID_DIR, f"{grid_id}.grid")
+    if not os.path.exists(path):
+        abort(404)
+    return path
+
+@app.route('/irrigation_grid', methods=['POST'])
+def irrigation_grid_create():
+    data = request.get_json()
+    irrigation_grid = registry.get("irrigation_grid")
+    try:
+        bbox = [float(v) for v in data['bbox']]
+        if len(bbox) != 4:
+            raise ValueError("bbox must be [min_lat, min_lon, max_lat, max_lon]")
+        resolution = float(data['resolution'])
+        rows, cols = irrigation_grid.grid_shape(bbox, resolution)
+        # Weather is only fetched at coarse nodes and interpolated; never finer than the cells themselves
+        coarse_resolution = float(
+            data.get('coarse_resolution') or max(resolution, irrigation_grid.IRRIGATION_GRID_COARSE_RESOLUTION)
+        )
+        if coarse_resolution < resolution:
+            raise ValueError("coarse_resolution must not be finer than resolution")
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid grid request: {e}'}), 400
+    if rows * cols > IRRIGATION_GRID_MAX_CELLS:
+        return jsonify({'error': f'Grid has {rows * cols} cells, the limit is {IRRIGATION_GRID_MAX_CELLS}'}), 400
+
+    soil_type = data.get('soil_type') or irrigation_grid.DEFAULT_SOIL_TYPE
+    args = (uuid.uuid4().hex, bbox, resolution, soil_type, coarse_resolution)
+    if wants_async(data):
+        return submit_job("irrigation_grid", irrigation_grid_response, *args)
+    return jsonify(irrigation_grid_response(*args))
+
+@app.route('/irrigation_grid/<grid_id>', methods=['GET'])
+def irrigation_grid_info(grid_id):
+    # Header only, or the value of one cell with ?lat=&lon=; neither reads the whole grid
+    irrigation_grid = registry.get("irrigation_grid")
+    path = irrigation_grid_path(grid_id)
+    header = irrigation_grid.read_header(path)
+    result = {'grid_id': grid_id, **header._asdict()}
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is not None and lon is not None:
+        try:
+            result['liters_per_m2'] = irrigation_grid.value_at(path, lat, lon)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result['lat'] = lat
+        result['lon'] = lon
+    return jsonify(result)
+
+@app.route('/irrigation_grid/<grid_id>/download', methods=['GET'])
+def irrigation_grid_download(grid_id):
+    irrigation_grid_path(grid_id)
+    return send_from_directory(
+        os.path.abspath(IRRIGATION_GRID_DIR), f"{grid_id}.grid", mimetype='application/octet-stream', as_attachment=True
+    )
+
+def water_analysis_response(session_id):
+    result = registry.get("water_analyzer").analyze_practices(session_id)
+    if result is None:
+        raise RuntimeError("Water analysis failed")
     traditional_practice = result.traditional_practice
     traditional_efficiency = result.traditional_efficiency
     traditional_description = result.traditional_description
     modern_practice = result.modern_practice
     improved_efficiency = result.improved_efficiency
     modern_description = result.modern_description
-    return jsonify({
+    return {
         "traditional_practice": traditional_practice,
         "traditional_efficiency": traditional_efficiency,
         "traditional_description": traditional_description,
         "modern_practice": modern_practice,
         "improved_efficiency": improved_efficiency,
         "modern_description": modern_description
-    })
+    }
+
+@app.route("/water_analysis", methods=['GET'])
+def water_analyse():
+    # data = request.json
+    session_id = session_id_from()
+    if wants_async():
+        return submit_job("water_analysis", water_analysis_response, session_id)
+    try:
+        return jsonify(water_analysis_response(session_id))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 502
+
+@app.route('/model_handles', methods=['GET'])
+def model_handle_stats():
+    from voice_assistant import model_handles
+    return jsonify(model_handles.stats())
+
+@app.route('/llm_stats', methods=['GET'])
+def llm_stats():
+    llm = registry.get("llm")
+    if not hasattr(llm, "stats"):
+        return jsonify({'router': False, 'model_id': llm.model_id})
+    return jsonify({'router': True, **llm.stats()})
+
+@app.route('/memory_stats', methods=['GET'])
+def memory_stats():
+    memory = registry.get("conversation_memory")
+    if memory is None:
+        return jsonify({'memory_mode': 'window'})
+    return jsonify({'memory_mode': 'summary', **memory.stats()})
+
+@app.route("/water_analysis/cache_stats", methods=['GET'])
+def water_analysis_cache_stats():
+    return jsonify(registry.get("water_analyzer").cache_stats())
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats():
+    return jsonify(registry.get("jobs").stats())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = registry.get("jobs").get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job)
 
 @app.route('/predict_festival_practice', methods=['POST'])
 def predict_festival_practice():
@@ -82,12 +471,38 @@ def predict_festival_practice():
     if not transcript:
         return jsonify({'error': 'No transcript provided'}), 400
     
-    predicted_festival, predicted_practice = predict_festival_and_practice(transcript)
+    festival_batcher = registry.get("festival_batcher")
+    if festival_batcher is not None:
+        predicted_festival, predicted_practice = festival_batcher.predict(transcript)
+    else:
+        predicted_festival, predicted_practice = registry.get("festival_classifier").predict_festival_and_practice(transcript)
     return jsonify({
         'predicted_festival': predicted_festival,
         'predicted_practice': predicted_practice
     })
 
+@app.route('/predict_festival_practice/batch', methods=['POST'])
+def predict_festival_practice_batch():
+    data = request.get_json()
+    transcripts = data.get('transcripts', [])
+    if not transcripts or not isinstance(transcripts, list):
+        return jsonify({'error': 'No transcripts provided'}), 400
+
+    predictions = registry.get("festival_classifier").predict_festival_and_practice_batch(transcripts)
+    return jsonify({
+        'predictions': [
+            {'predicted_festival': festival, 'predicted_practice': practice}
+            for festival, practice in predictions
+        ]
+    })
+
+@app.route('/predict_festival_practice/stats', methods=['GET'])
+def predict_festival_practice_stats():
+    festival_batcher = registry.get("festival_batcher") if registry.is_loaded("festival_batcher") else None
+    if festival_batcher is None:
+        return jsonify({'micro_batching': False})
+    return jsonify({'micro_batching': True, **festival_batcher.stats()})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=7000, debug=True)
 
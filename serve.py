@@ -0,0 +1,95 @@
+"""Production entry point: load the models once, then fork gunicorn workers.
+
+    WORKERS=4 THREADS=8 python serve.py
+
+The master process imports models.py and loads PRELOAD_COMPONENTS before
+forking, so workers share the torch weights, vectorizer and model handles
+through copy-on-write instead of each loading their own copy.
+"""
+import gc
+import os
+import sys
+
+# Pin intra-op threads before torch/NumPy are imported anywhere, so N workers
+# don't each start one BLAS/OpenMP thread per core
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "1"))
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_THREADS))
+
+from gunicorn.app.base import BaseApplication
+
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+THREADS = int(os.getenv("THREADS", "4"))
+BIND = os.getenv("BIND", "0.0.0.0:7000")
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "120"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# "all", "none" or a comma-separated list of registry components
+PRELOAD_COMPONENTS = os.getenv("PRELOAD_COMPONENTS", "all")
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only settable before the first parallel op; already fixed if the master ran one
+            pass
+
+
+def worker_exit(server, worker):
+    # Flush buffered history writes and stop batcher threads before the worker goes away
+    from models import registry
+    registry.close()
+
+
+class PreforkApplication(BaseApplication):
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    # serve.py does its own synchronous warm-up; a background one could still be running at fork time
+    os.environ["MODEL_WARMUP"] = ""
+    os.environ["MODEL_HANDLE_PREFETCH"] = "0"
+    from models import app, registry
+    from voice_assistant import model_handles
+
+    # Build last run's aiXplain models concurrently, so the warm-up below finds them in memory.
+    # Only when every component is preloaded: a partial preload resolves just the models it needs
+    if PRELOAD_COMPONENTS == "all":
+        model_handles.prefetch()
+    if PRELOAD_COMPONENTS != "none":
+        registry.warm_up(None if PRELOAD_COMPONENTS == "all" else PRELOAD_COMPONENTS.split(","))
+
+    # Move everything loaded so far out of the GC's reach, so collections in the
+    # workers don't touch (and un-share) the parent's pages
+    gc.collect()
+    gc.freeze()
+
+    options = {
+        "bind": BIND,
+        "workers": WORKERS,
+        "threads": THREADS,
+        "worker_class": "gthread" if THREADS > 1 else "sync",
+        "timeout": WORKER_TIMEOUT,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+    PreforkApplication(app, options).run()
+
+
+if __name__ == "__main__":
+    main()
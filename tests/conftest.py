@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AIXPLAIN_ACCESS_KEY", "test")
+os.environ.setdefault("MODEL_HANDLE_CACHE", "0")
+
+# Some modules append voice_assistant/ to sys.path; import the package before
+# voice_assistant/voice_assistant.py can shadow it
+import voice_assistant  # noqa: E402,F401
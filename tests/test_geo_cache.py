@@ -0,0 +1,63 @@
+import json
+
+from irrigation_plan.geo_cache import GeoTTLCache, SQLiteStore
+
+
+def test_workers_sharing_a_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "geocode.db")
+    worker_a, worker_b = SQLiteStore(path), SQLiteStore(path)
+    worker_a.put("1.0,2.0", "Pune", 100.0)
+    worker_b.put("3.0,4.0", "Nashik", 200.0)
+
+    restarted = SQLiteStore(path)
+    assert restarted.get("1.0,2.0") == ("Pune", 100.0)
+    assert restarted.get("3.0,4.0") == ("Nashik", 200.0)
+    assert restarted.get("5.0,6.0") is None
+
+
+def test_json_cache_file_is_imported(tmp_path):
+    path = tmp_path / "geocode.json"
+    path.write_text(json.dumps({"1.0,2.0": ["Pune", 100.0]}))
+
+    store = SQLiteStore(str(path))
+    assert store.get("1.0,2.0") == ("Pune", 100.0)
+    assert (tmp_path / "geocode.json.json.bak").exists()
+
+
+def test_cache_reads_through_to_the_store(tmp_path):
+    path = str(tmp_path / "geocode.db")
+    calls = []
+
+    def fetch(centre):
+        calls.append(centre)
+        return f"place at {centre}"
+
+    GeoTTLCache(fetch, ttl=None, grid_deg=0.1, store=SQLiteStore(path)).get((18.52, 73.87))
+    value = GeoTTLCache(fetch, ttl=None, grid_deg=0.1, store=SQLiteStore(path)).get((18.53, 73.88))
+    assert value == "place at (18.5, 73.9)"
+    assert len(calls) == 1
+
+
+def test_store_reads_do_not_block_other_lookups():
+    import threading
+    import time
+
+    class SlowStore:
+        def get(self, key):
+            time.sleep(0.3)
+            return None
+
+        def put(self, key, value, fetched_at):
+            pass
+
+    cache = GeoTTLCache(lambda centre: f"place at {centre}", ttl=None, grid_deg=0.1, store=SlowStore())
+    cache._remember("18.5,73.9", "Pune", time.time())
+
+    miss = threading.Thread(target=cache.get, args=((10.0, 10.0),))
+    miss.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    assert cache.get((18.52, 73.87)) == "Pune"
+    assert time.perf_counter() - start < 0.1
+    miss.join()
+    assert cache.stats()["misses"] == 1
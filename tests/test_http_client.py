@@ -0,0 +1,111 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from common.http_client import HTTPClient
+
+
+class Stub:
+    """Local HTTP server answering each request with the next (status, headers, delay) in ``responses``."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                stub.requests.append((self.command, time.perf_counter()))
+                status, headers, delay = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                time.sleep(delay)
+                body = b"ok" if status == 200 else b"error"
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/weather"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stubs = []
+
+    def make(*responses):
+        stubs.append(Stub(responses))
+        return stubs[-1]
+
+    yield make
+    for server in stubs:
+        server.close()
+
+
+def client(**kwargs):
+    options = dict(connect_timeout=1, read_timeout=1, max_retries=2, backoff_factor=0.1, backoff_max=1,
+                   host_pool_limits={})
+    options.update(kwargs)
+    return HTTPClient(**options)
+
+
+def test_get_retries_5xx_with_backoff(stub):
+    server = stub((503, {}, 0), (502, {}, 0), (200, {}, 0))
+    http = client()
+    response = http.get(server.url)
+
+    assert response.status_code == 200
+    assert len(server.requests) == 3
+    # urllib3 2 retries the first failure at once and backs off factor * 2 before the second retry
+    gaps = [b[1] - a[1] for a, b in zip(server.requests, server.requests[1:])]
+    assert gaps[1] >= 0.2 * 0.9
+    assert http.host_metrics()["127.0.0.1"]["status_codes"] == {200: 1}
+
+
+def test_retries_are_bounded_and_the_last_response_returned(stub):
+    server = stub((503, {}, 0))
+    http = client(max_retries=2, backoff_factor=0)
+    response = http.get(server.url)
+
+    assert response.status_code == 503
+    assert len(server.requests) == 3
+    assert http.host_metrics()["127.0.0.1"]["errors"] == 1
+
+
+def test_post_is_not_retried(stub):
+    server = stub((503, {}, 0), (200, {}, 0))
+    assert client().post(server.url, json={}).status_code == 503
+    assert len(server.requests) == 1
+
+
+def test_retry_after_header_is_respected(stub):
+    server = stub((429, {"Retry-After": "1"}, 0), (200, {}, 0))
+    assert client(backoff_factor=0).get(server.url).status_code == 200
+    assert server.requests[1][1] - server.requests[0][1] >= 0.9
+
+
+def test_read_timeout_raises_and_is_recorded(stub):
+    server = stub((200, {}, 0.5))
+    http = client(read_timeout=0.1, max_retries=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.RequestException):
+        http.get(server.url)
+    assert time.perf_counter() - start < 0.45
+    assert http.host_metrics()["127.0.0.1"]["errors"] == 1
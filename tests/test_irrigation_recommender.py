@@ -0,0 +1,109 @@
+import threading
+import time
+import warnings
+
+import numpy as np
+import pytest
+
+from irrigation_plan import irrigation_recommender
+from irrigation_plan.irrigation_recommender import SOIL_CODES, calculate_irrigation, encode_soil_types
+
+WEATHER = {"temp": 300.0, "humidity": 60, "rain": 0, "wind_speed": 2.0}
+
+
+@pytest.mark.parametrize("soil_type", ["loamy", "Sandy", "unknown soil", SOIL_CODES["clay"]])
+def test_scalar_inputs_return_a_float_without_warnings(soil_type):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        water = calculate_irrigation(soil_type, 25.0, 60.0, 1.5, 3.0)
+    assert type(water) is float
+
+
+def test_scalar_matches_the_vectorized_path():
+    soils = ["loamy", "sandy", "clay", "unknown soil"]
+    temps = np.array([18.0, 25.0, 31.0, 22.0])
+    vector = calculate_irrigation(encode_soil_types(soils), temps, 55.0 + temps, np.zeros(4), np.full(4, 2.0))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        scalars = [calculate_irrigation(s, t, 55.0 + t, 0.0, 2.0) for s, t in zip(soils, temps)]
+    assert vector.shape == (4,)
+    assert scalars == vector.tolist()
+    assert min(scalars) >= 5
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    calls = {"narratives": [], "threads": set()}
+
+    def weather(location):
+        if location[0] < 0:
+            raise RuntimeError("weather down")
+        return dict(WEATHER)
+
+    def place(location):
+        if location[0] == 30:
+            raise RuntimeError("geocoder down")
+        return f"place {location[0]}"
+
+    def plan(crop, stage, soil_type, weather, exact_location):
+        calls["threads"].add(threading.get_ident())
+        time.sleep(0.05)
+        if crop == "bad":
+            raise RuntimeError("LLM error")
+        calls["narratives"].append(exact_location)
+        return f"plan for {crop} at {exact_location}"
+
+    monkeypatch.setattr(irrigation_recommender, "get_weather_data", weather)
+    monkeypatch.setattr(irrigation_recommender, "get_location_from_coords", place)
+    monkeypatch.setattr(irrigation_recommender, "generate_irrigation_plan", plan)
+    return calls
+
+
+def test_batch_failures_stay_with_their_plot(fake_services):
+    plots = [
+        {"crop": "rice", "stage": "v", "location": [10, 80]},
+        {"crop": "rice", "stage": "v", "location": [-10, 80]},   # weather fails
+        {"crop": "rice", "stage": "v", "location": [30, 80]},    # geocode fails
+        {"crop": "bad", "stage": "v", "location": [20, 80]},     # LLM fails
+        {"crop": "wheat", "stage": "v", "location": [40, 80]},
+    ]
+    results = irrigation_recommender.irrigation_plan_batch(plots, include_narrative=True)
+
+    assert results[0]["irrigation_plan"] == "plan for rice at place 10.0"
+    assert results[1]["error"].startswith("Failed to fetch weather data")
+    assert results[2]["error"] == "Failed to generate irrigation plan: geocoder down"
+    assert results[2]["irrigation_liters_per_m2"] > 0
+    assert results[3]["error"] == "Failed to generate irrigation plan: LLM error"
+    assert results[4]["irrigation_plan"] == "plan for wheat at place 40.0"
+    # Narratives ran concurrently, not one plot at a time
+    assert len(fake_services["threads"]) > 1
+
+
+@pytest.mark.parametrize("location", [None, "10,80", [10], [10, "x"], [95, 80]])
+def test_malformed_location_is_rejected_up_front(fake_services, location):
+    plots = [{"crop": "rice", "location": [10, 80]}, {"crop": "rice", "location": location}]
+    with pytest.raises(ValueError, match="Plot 1"):
+        irrigation_recommender.irrigation_plan_batch(plots, include_narrative=True)
+    assert fake_services["narratives"] == []
+
+
+def test_plans_use_real_weather_and_bucketed_keys(monkeypatch):
+    from irrigation_plan.plan_cache import PlanCache
+
+    prompts = []
+
+    class FakeLLM:
+        def get_response(self, text, long_context=False):
+            prompts.append(text)
+            return f"plan {len(prompts)}"
+
+    monkeypatch.setattr(irrigation_recommender, "plan_cache", PlanCache(temp_resolution=1, humidity_resolution=5))
+    monkeypatch.setattr(irrigation_recommender, "model", FakeLLM())
+    weather = {"temp": 301.37, "humidity": 63, "rain": 0.2, "wind_speed": 3.3}
+    nearby = {"temp": 301.41, "humidity": 64, "rain": 0.2, "wind_speed": 3.4}
+
+    first = irrigation_recommender.generate_irrigation_plan("rice", "v", "loamy", weather, "Pune")
+    assert "temperature: 301.37K" in prompts[0] and "humidity: 63" in prompts[0]
+    # Similar weather in the same buckets reuses the plan without another LLM call
+    assert irrigation_recommender.generate_irrigation_plan("rice", "v", "loamy", nearby, "Pune") == first
+    assert len(prompts) == 1
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from common.jobs import DONE, FAILED, JobManager, JobQueueFull, MemoryJobStore, SQLiteJobStore
+
+
+def wait_for(manager, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore(ttl=0.2)
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), ttl=0.2)
+
+
+def test_result_and_error_are_kept_for_polling(store):
+    manager = JobManager(max_workers=2, store=store)
+    try:
+        ok = manager.submit("plan", lambda crop: {"plan": f"water the {crop}"}, "rice")
+        failed = manager.submit("plan", lambda: 1 / 0)
+        assert wait_for(manager, ok)["result"] == {"plan": "water the rice"}
+        assert wait_for(manager, failed)["error"].startswith("ZeroDivisionError")
+    finally:
+        manager.close()
+
+
+def test_queue_full_raises_until_a_slot_frees(store):
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_queue=1, store=store)
+    try:
+        running = manager.submit("plan", release.wait)
+        queued = manager.submit("plan", lambda: "queued")
+        with pytest.raises(JobQueueFull):
+            manager.submit("plan", lambda: "rejected")
+        assert manager.stats()["rejected"] == 1
+
+        release.set()
+        wait_for(manager, running)
+        wait_for(manager, queued)
+        assert manager.get(manager.submit("plan", lambda: "accepted")) is not None
+    finally:
+        release.set()
+        manager.close()
+
+
+def test_finished_jobs_expire_after_the_ttl(store):
+    manager = JobManager(max_workers=1, store=store)
+    try:
+        job_id = manager.submit("plan", lambda: "done")
+        wait_for(manager, job_id)
+        time.sleep(0.3)
+        assert manager.get(job_id) is None
+    finally:
+        manager.close()
+
+
+def test_routes_answer_202_and_429(monkeypatch):
+    models = pytest.importorskip("models")
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_queue=0)
+    monkeypatch.setitem(models.registry._instances, "jobs", manager)
+    try:
+        with models.app.test_request_context("/water_analysis?async=1"):
+            assert models.wants_async()
+            response, status, headers = models.submit_job("water_analysis", release.wait)
+            assert status == 202
+            job_id = response.get_json()["job_id"]
+            assert headers["Location"] == f"/jobs/{job_id}"
+
+            response, status, headers = models.submit_job("water_analysis", release.wait)
+            assert status == 429
+            assert headers["Retry-After"] == "5"
+
+        release.set()
+        wait_for(manager, job_id)
+        poll = models.app.test_client().get(f"/jobs/{job_id}")
+        assert poll.status_code == 200
+        assert poll.get_json()["status"] == DONE
+    finally:
+        release.set()
+        manager.close()
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from voice_assistant.llm_router import CircuitBreaker, LLMDeadlineExceeded, LLMRouter
+
+RESET = 0.05
+
+
+class FlakyModel:
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.failing = False
+        self.calls = 0
+
+    def get_response(self, text, long_context=False):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError(f"{self.model_id} is down")
+        return f"{self.model_id}: {text}"
+
+    def stream_response(self, text, long_context=False):
+        yield self.get_response(text, long_context)
+
+
+def make_router():
+    primary, secondary = FlakyModel("primary"), FlakyModel("secondary")
+    router = LLMRouter([primary, secondary], deadline=5, failure_threshold=1, reset_timeout=RESET)
+    return router, primary, secondary
+
+
+def states(router):
+    return [route.breaker.state for route in router.routes]
+
+
+def test_secondary_recovers_after_one_outage():
+    router, primary, secondary = make_router()
+    try:
+        # Both down: each breaker opens after its single allowed failure
+        primary.failing = secondary.failing = True
+        try:
+            router.get_response("hi")
+        except RuntimeError:
+            pass
+        assert states(router) == [CircuitBreaker.OPEN, CircuitBreaker.OPEN]
+
+        # Primary back: its trial call succeeds and the untried secondary stays plainly open
+        primary.failing = secondary.failing = False
+        time.sleep(RESET * 2)
+        assert router.get_response("hi") == "primary: hi"
+        assert states(router) == [CircuitBreaker.CLOSED, CircuitBreaker.OPEN]
+
+        # Primary fails later: the secondary is still eligible for its trial call and closes again
+        primary.failing = True
+        assert router.get_response("hi") == "secondary: hi"
+        assert states(router) == [CircuitBreaker.OPEN, CircuitBreaker.CLOSED]
+        assert router.stats()["fallbacks"] == 1
+    finally:
+        router.close()
+
+
+def test_stream_only_takes_trial_slot_of_the_streaming_route():
+    router, primary, secondary = make_router()
+    router.routes[1].breaker.record_failure()
+    time.sleep(RESET * 2)
+
+    assert list(router.stream_response("hi")) == ["primary: hi"]
+    assert states(router) == [CircuitBreaker.CLOSED, CircuitBreaker.OPEN]
+    assert router.routes[1].breaker.allow()
+    assert secondary.calls == 0
+
+
+def test_untried_route_is_not_left_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    breaker.record_failure()
+    time.sleep(RESET * 2)
+    assert breaker.available()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available()
+
+
+class DelayedModel:
+    """Fake backend that sleeps ``delay`` seconds per call, then answers or raises."""
+
+    def __init__(self, model_id, delay=0.0, failing=False):
+        self.model_id = model_id
+        self.delay = delay
+        self.failing = failing
+        self.finished = threading.Event()
+
+    def get_response(self, text, long_context=False):
+        self.finished.clear()
+        time.sleep(self.delay)
+        self.finished.set()
+        if self.failing:
+            raise RuntimeError(f"{self.model_id} is down")
+        return f"{self.model_id}: {text}"
+
+
+def test_hedge_fires_and_wins_when_the_primary_stalls():
+    primary, secondary = DelayedModel("primary", 0.01), DelayedModel("secondary", 0.01)
+    router = LLMRouter([primary, secondary], deadline=5, hedge_percentile=95, hedge_min_samples=5)
+    try:
+        for _ in range(5):
+            router.get_response("warm up")
+
+        primary.delay = 2.0
+        start = time.perf_counter()
+        assert router.get_response("hi") == "secondary: hi"
+        assert time.perf_counter() - start < 0.5
+        stats = router.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+    finally:
+        router.close()
+
+
+def test_error_falls_back_within_the_budget():
+    primary, secondary = DelayedModel("primary", 0.05, failing=True), DelayedModel("secondary", 0.05)
+    router = LLMRouter([primary, secondary], deadline=0.5)
+    try:
+        start = time.perf_counter()
+        assert router.get_response("hi") == "secondary: hi"
+        assert time.perf_counter() - start < 0.5
+        assert router.stats()["fallbacks"] == 1
+    finally:
+        router.close()
+
+
+def test_deadline_raises_within_the_budget_and_records_the_late_call_once():
+    primary, secondary = DelayedModel("primary", 0.4, failing=True), DelayedModel("secondary", 0.4)
+    router = LLMRouter([primary, secondary], deadline=0.1, failure_threshold=2)
+    try:
+        start = time.perf_counter()
+        with pytest.raises(LLMDeadlineExceeded):
+            router.get_response("hi")
+        assert time.perf_counter() - start < 0.3
+        assert router.stats()["deadline_exceeded"] == 1
+
+        # The stalled call now fails for real; the deadline already counted it
+        assert primary.finished.wait(2)
+        time.sleep(0.05)
+        assert router.routes[0].breaker.failures == 1
+        assert router.routes[0].breaker.state == CircuitBreaker.CLOSED
+    finally:
+        router.close()
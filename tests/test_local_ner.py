@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+from voice_assistant.local_ner import AhoCorasickMatcher, LocalNERModel, get_local_ner
+from voice_assistant.model_classes import NERModel
+
+
+def test_gazetteer_matches_each_section():
+    entities = get_local_ner().extract_entities(
+        "We use drip irrigation for Rice on sandy loam soil and pray at Pongal"
+    )
+    assert entities == [
+        {"drip irrigation": "IrrigationMethod"},
+        {"Rice": "Crop"},
+        {"sandy loam soil": "Soil"},
+        {"Pongal": "Festival"},
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Well, my crop is doing fine",
+    "The fish tank is full",
+    "Add 100 gram of salt",
+])
+def test_everyday_words_are_not_entities(text):
+    assert get_local_ner().extract_entities(text) == []
+
+
+def test_farming_compounds_of_everyday_words_still_match():
+    entities = get_local_ner().extract_entities("The open well and the water tank feed our green gram")
+    assert entities == [{"open well": "IrrigationMethod"}, {"water tank": "IrrigationMethod"}, {"green gram": "Crop"}]
+
+
+def test_whole_words_and_leftmost_longest():
+    matcher = AhoCorasickMatcher({"rice": "Crop", "rice field": "Place", "ice": "Thing"})
+    text = "Price of rice fields; rice field nearby"
+    assert [text[start:end] for start, end, _ in matcher.find(text)] == ["rice", "rice field"]
+
+
+def test_spans_index_the_original_text():
+    # "İ".lower() is two characters; offsets must not drift after it
+    model = LocalNERModel({"rice": "Crop"})
+    assert model.extract_entities("İİ grow Rice") == [{"Rice": "Crop"}]
+
+
+class FakeRemoteNER:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, payload):
+        self.calls += 1
+        text = payload["text"]
+        start = text.index("fertilizer")
+        return SimpleNamespace(details=[{"boundingBox": {"start": start, "end": start + 10}, "data": "Product"}])
+
+
+def make_ner(backend):
+    ner = NERModel.__new__(NERModel)
+    ner.backend = backend
+    ner.local_model = LocalNERModel({"rice": "Crop"})
+    ner.model = FakeRemoteNER()
+    return ner
+
+
+def test_remote_is_only_called_when_local_finds_nothing():
+    ner = make_ner("local+remote")
+    assert ner.extract_entities("rice with fertilizer") == [{"rice": "Crop"}]
+    assert ner.model.calls == 0
+
+    assert ner.extract_entities("which fertilizer is best") == [{"fertilizer": "Product"}]
+    assert ner.model.calls == 1
+
+
+def test_local_only_backend_never_calls_remote():
+    ner = make_ner("local")
+    ner.model = None
+    assert ner.extract_entities("which fertilizer is best") == []
@@ -0,0 +1,20 @@
+import pytest
+
+from cultural_practices.micro_batcher import MicroBatcher
+
+
+def test_results_are_returned_per_caller():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+    batcher.close()
+
+
+def test_short_result_list_fails_every_caller():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="results for"):
+            future.result(timeout=5)
+    assert batcher.stats()["errors"] >= 1
+    batcher.close()
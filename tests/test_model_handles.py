@@ -0,0 +1,125 @@
+import json
+import threading
+
+import pytest
+
+from voice_assistant import model_handles
+
+
+class FakeHandle:
+    def __init__(self, response):
+        self.id = response["id"]
+        self.name = response["name"]
+        self.api_key = response["api_key"]
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    fetched = []
+
+    def fetch_response(model_id):
+        fetched.append(model_id)
+        return {"id": model_id, "name": f"model {model_id}", "api_key": "secret"}
+
+    index = model_handles.ModelIndex(str(tmp_path))
+    index._version = "test"
+    monkeypatch.setattr(model_handles, "_index", index)
+    monkeypatch.setattr(model_handles, "_fetch_response", fetch_response)
+    monkeypatch.setattr(model_handles, "_build", lambda response: FakeHandle({**response, "api_key": "team"}))
+    monkeypatch.setattr(model_handles, "_handles", {})
+    index.fetched = fetched
+    return index
+
+
+def restart(monkeypatch):
+    # A new process: empty handle table, same index on disk
+    monkeypatch.setattr(model_handles, "_handles", {})
+
+
+def test_one_handle_per_model_and_no_key_on_disk(index):
+    assert model_handles.get_model("a") is model_handles.get_model("a")
+    assert index.fetched == ["a"]
+
+    with open(index.path) as f:
+        raw = f.read()
+    assert "secret" not in raw
+    entry = json.loads(raw)["models"]["a"]
+    assert entry["name"] == "model a"
+    assert entry["response"] == {"id": "a", "name": "model a"}
+
+
+def test_restart_builds_from_index_without_fetching(index, monkeypatch):
+    model_handles.get_model("a")
+    restart(monkeypatch)
+
+    handle = model_handles.get_model("a")
+    assert index.fetched == ["a"]
+    assert handle.name == "model a"
+    assert handle.api_key == "team"
+
+
+def test_stale_entries_are_fetched_again(index, monkeypatch):
+    model_handles.get_model("a")
+    model_handles.get_model("b")
+
+    restart(monkeypatch)
+    index._version = "newer"
+    model_handles.get_model("a")
+    assert index.fetched == ["a", "b", "a"]
+
+    restart(monkeypatch)
+    index.ttl = -1
+    model_handles.get_model("b")
+    assert index.fetched == ["a", "b", "a", "b"]
+
+
+def test_unbuildable_metadata_is_fetched_again(index, monkeypatch):
+    model_handles.get_model("a")
+    restart(monkeypatch)
+    builds = []
+
+    def build(response):
+        builds.append(response)
+        if len(builds) == 1:
+            raise KeyError("function")
+        return FakeHandle({**response, "api_key": "team"})
+
+    monkeypatch.setattr(model_handles, "_build", build)
+    assert model_handles.get_model("a").name == "model a"
+    assert index.fetched == ["a", "a"]
+
+
+def test_concurrent_records_keep_every_entry(index):
+    threads = [threading.Thread(target=model_handles.get_model, args=(f"m{i}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(index.read()) == sorted(f"m{i}" for i in range(16))
+
+
+def test_prefetch_builds_fresh_models_locally(index, monkeypatch):
+    model_handles.get_model("a")
+    model_handles.get_model("b")
+
+    restart(monkeypatch)
+    assert model_handles.prefetch() == 2
+    assert sorted(index.fetched) == ["a", "b"]
+    assert set(model_handles._handles) == {"a", "b"}
+
+
+def test_stale_version_is_not_prefetched(index, monkeypatch):
+    model_handles.get_model("a")
+    restart(monkeypatch)
+    index._version = "newer"
+    assert model_handles.prefetch() == 0
+
+
+def test_without_index_handles_come_from_model_factory(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(model_handles, "_index", None)
+    monkeypatch.setattr(model_handles, "_handles", {})
+    monkeypatch.setattr(model_handles, "_fetch", lambda model_id: fetched.append(model_id) or object())
+    model_handles.get_model("a")
+    model_handles.get_model("a")
+    assert fetched == ["a"]
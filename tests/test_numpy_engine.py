@@ -0,0 +1,53 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from cultural_practices.numpy_engine import check_parity, load_numpy_engine
+
+torch = pytest.importorskip("torch")
+
+from cultural_practices.lstm_classifier import LSTMClassifier, TorchEngine  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODEL_PATH = os.path.join(ROOT, "cultural_practices", "lstm_model.pth")
+
+
+def tfidf_like(rows, cols, seed=0):
+    # Sparse non-negative rows, L2-normalised like TF-IDF output
+    rng = np.random.default_rng(seed)
+    features = rng.random((rows, cols), dtype=np.float32)
+    features *= rng.random(features.shape) < 0.1
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.where(norms == 0, 1, norms)
+
+
+def test_parity_with_torch_model(tmp_path):
+    torch.manual_seed(0)
+    # forward() hard-codes a 128-unit zero state
+    model = LSTMClassifier(input_size=40, hidden_size=128, num_layers=1, num_festivals=5, num_practices=7)
+    model_path = str(tmp_path / "lstm_model.pth")
+    torch.save(model.state_dict(), model_path)
+
+    engine = load_numpy_engine(str(tmp_path / "lstm_model.npz"), model_path)
+    features = tfidf_like(500, 40)
+    for inputs in (features, sp.csr_matrix(features)):
+        report = check_parity(TorchEngine(model), engine, inputs)
+        assert report["max_abs_diff"] < 1e-5
+        assert report["argmax_agreement"] == 1.0
+
+
+def test_retrained_model_is_re_exported(tmp_path):
+    model_path = str(tmp_path / "lstm_model.pth")
+    npz_path = str(tmp_path / "lstm_model.npz")
+    shutil.copy(MODEL_PATH, model_path)
+    before = load_numpy_engine(npz_path, model_path)
+
+    state_dict = torch.load(model_path)
+    state_dict["fc_festival.bias"] += 1
+    torch.save(state_dict, model_path)
+    after = load_numpy_engine(npz_path, model_path)
+
+    np.testing.assert_allclose(after.b_heads[:after.num_festivals], before.b_heads[:before.num_festivals] + 1)
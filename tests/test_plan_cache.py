@@ -0,0 +1,29 @@
+import sqlite3
+import time
+
+from irrigation_plan.plan_cache import PlanCache
+
+
+def disk_rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+
+def test_disk_table_is_capped(tmp_path):
+    path = str(tmp_path / "plans.db")
+    cache = PlanCache(max_entries=10, path=path, max_disk_entries=25, prune_interval=10)
+    for i in range(100):
+        cache.put(f"key-{i}", f"plan {i}")
+    assert disk_rows(path) <= 25 + 10
+    # The newest plans survive
+    assert PlanCache(path=path).get("key-99") == "plan 99"
+
+
+def test_expired_rows_are_deleted_on_write(tmp_path):
+    path = str(tmp_path / "plans.db")
+    cache = PlanCache(ttl=0.05, path=path, prune_interval=5)
+    for i in range(4):
+        cache.put(f"old-{i}", "stale")
+    time.sleep(0.1)
+    cache.put("new", "fresh")
+    assert disk_rows(path) == 1
@@ -0,0 +1,89 @@
+import pytest
+
+from voice_assistant.session_store import SessionStore
+from voice_assistant.sqlite_history import SQLiteHistoryStore
+from voice_assistant.summary_memory import RollingSummaryMemory
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def get_response(self, text, long_context=False):
+        self.prompts.append(text)
+        return f"summary {len(self.prompts)}"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def history_store(request, tmp_path):
+    if request.param == "memory":
+        store = SessionStore()
+    else:
+        store = SQLiteHistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def folded_turns(prompt):
+    return prompt.split("New conversation turns:\n", 1)[1].strip().splitlines()
+
+
+def test_repeated_messages_are_folded_exactly_once(history_store):
+    llm = RecordingLLM()
+    memory = RollingSummaryMemory(llm, history_store, recent_turns=1)
+    for query, response in [("yes", "ok"), ("yes", "ok"), ("water?", "20 L"), ("yes", "ok")]:
+        history_store.append_turn("s", query, response)
+        memory.update("s")
+
+    # Each turn is folded once it leaves the one-turn verbatim window, never twice or skipped
+    assert [folded_turns(p) for p in llm.prompts] == [
+        ["User: yes", "AI: ok"],
+        ["User: yes", "AI: ok"],
+        ["User: water?", "AI: 20 L"],
+    ]
+    summary, recent = memory.context("s")
+    assert summary == "summary 3"
+    assert recent == [(0, "yes"), (1, "ok")]
+
+
+def test_summary_is_shared_by_workers_on_one_database(tmp_path):
+    path = str(tmp_path / "history.db")
+    first, second = SQLiteHistoryStore(path), SQLiteHistoryStore(path)
+    llm = RecordingLLM()
+    worker_a = RollingSummaryMemory(llm, first, recent_turns=1)
+    worker_b = RollingSummaryMemory(llm, second, recent_turns=1)
+
+    first.append_turn("s", "my soil is clay", "noted")
+    first.append_turn("s", "and it is dry", "irrigate more")
+    worker_a.update("s")
+    worker_b.update("s")
+
+    assert len(llm.prompts) == 1
+    assert worker_b.context("s")[0] == "summary 1"
+    assert not first.put_summary("s", "stale", 0)
+
+
+def test_background_updates_use_their_own_pool_and_drain_on_close():
+    import threading
+    import time
+
+    threads = []
+
+    class SlowLLM(RecordingLLM):
+        def get_response(self, text, long_context=False):
+            threads.append(threading.current_thread().name)
+            time.sleep(0.05)
+            return super().get_response(text, long_context)
+
+    history_store = SessionStore()
+    llm = SlowLLM()
+    memory = RollingSummaryMemory(llm, history_store, recent_turns=1, summary_workers=1)
+    for session_id in ("a", "b"):
+        history_store.append_turn(session_id, "my soil is clay", "noted")
+        history_store.append_turn(session_id, "and it is dry", "irrigate more")
+        memory.update_in_background(session_id)
+
+    memory.close()
+    assert len(llm.prompts) == 2
+    assert all(name.startswith("memory-summary") for name in threads)
+    assert memory.context("a")[0] and memory.context("b")[0]
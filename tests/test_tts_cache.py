@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from voice_assistant import model_classes
+from voice_assistant.model_classes import TTSModelAixplain
+from voice_assistant.tts_cache import TTSCache, cache_key
+
+
+def writer(payload, calls=None, delay=0.0):
+    def synthesize(temp_path):
+        if calls is not None:
+            calls.append(temp_path)
+        time.sleep(delay)
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+    return synthesize
+
+
+def test_hit_reuses_the_clip(tmp_path):
+    cache = TTSCache(str(tmp_path), url_prefix="/audio")
+    calls = []
+    first = cache.get_or_create("Water at dawn.", "voice", writer(b"mp3", calls))
+    second = cache.get_or_create("Water at dawn.", "voice", writer(b"other", calls))
+
+    assert first == second == cache.path_for(cache_key("Water at dawn.", "voice"))
+    assert len(calls) == 1
+    assert open(first, "rb").read() == b"mp3"
+    assert cache.location(first) == f"/audio/{cache_key('Water at dawn.', 'voice')}.mp3"
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_clips_are_evicted(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    old = cache.get_or_create("one", "v", writer(b"x" * 100))
+    kept = cache.get_or_create("two", "v", writer(b"x" * 100))
+    past = time.time() - 60
+    os.utime(old, (past, past))
+    os.utime(kept, (past + 1, past + 1))
+    cache.get_or_create("two", "v", writer(b"unused"))  # A hit makes "two" the most recent
+
+    cache.get_or_create("three", "v", writer(b"x" * 100))
+    assert not os.path.exists(old)
+    assert os.path.exists(kept)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 250
+
+
+def test_concurrent_misses_synthesize_once(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    calls = []
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_create("same", "v", writer(b"mp3", calls, 0.1))))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and len(results) == 8
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_failed_synthesis_leaves_no_file_and_is_retried(tmp_path):
+    cache = TTSCache(str(tmp_path))
+
+    def broken(temp_path):
+        open(temp_path, "wb").close()
+        raise RuntimeError("TTS down")
+
+    try:
+        cache.get_or_create("text", "v", broken)
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+    assert os.path.exists(cache.get_or_create("text", "v", writer(b"mp3")))
+
+
+def test_aixplain_speak_returns_a_local_audio_url(tmp_path, monkeypatch):
+    downloads = []
+
+    def fake_get(url):
+        downloads.append(url)
+        return SimpleNamespace(content=b"mp3", raise_for_status=lambda: None)
+
+    monkeypatch.setattr(model_classes.http_client, "get", fake_get)
+    tts = TTSModelAixplain.__new__(TTSModelAixplain)
+    tts.model = SimpleNamespace(run=lambda payload: SimpleNamespace(data="https://provider.example/clip.mp3"))
+    tts.cache = TTSCache(str(tmp_path), url_prefix="/audio")
+
+    assert tts.speak("Water at dawn.") == f"/audio/{cache_key('Water at dawn.', TTSModelAixplain.VOICE)}.mp3"
+    tts.speak("Water at dawn.")
+    assert downloads == ["https://provider.example/clip.mp3"]
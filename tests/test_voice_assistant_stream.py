@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from voice_assistant.model_classes import LLM_STREAM_RESPONSES, LLMModel
+from voice_assistant.voice_assistant import VoiceAssistant
+
+
+class FakePrompt:
+    def format_prompt(self, **inputs):
+        return SimpleNamespace(to_string=lambda: inputs["input"])
+
+
+class FakeStreamingLLM:
+    streams = True
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def stream_response(self, prompt, long_context=False):
+        yield from self.chunks
+
+
+class FlakyTTS:
+    def speak(self, text):
+        if "fails" in text:
+            raise RuntimeError("TTS unavailable")
+        return f"audio:{text}"
+
+
+def make_assistant(chunks):
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.prompt_template = FakePrompt()
+    assistant.llm = SimpleNamespace(model=FakeStreamingLLM(chunks))
+    assistant.tts_model = FlakyTTS()
+    assistant._chain_inputs = lambda text, session_id: {"input": text}
+    assistant.turns = []
+    assistant._append_turn = lambda session_id, query, response: assistant.turns.append((session_id, query, response))
+    return assistant
+
+
+def test_tts_failure_is_reported_and_the_turn_is_still_saved():
+    assistant = make_assistant(["**Water** the field at dawn. ", "This sentence fails to speak. ", "Use *drip* lines."])
+    events = list(assistant.stream_chat("how do I irrigate?", "s"))
+
+    assert [event["event"] for event in events] == ["audio", "audio_error", "audio", "done"]
+    assert events[0]["text"] == "Water the field at dawn."
+    assert events[0]["audio"] == "audio:Water the field at dawn."
+    assert events[2]["text"] == "Use drip lines."
+    assert events[1]["error"] == "TTS unavailable"
+    assert assistant.turns == [("s", "how do I irrigate?", events[-1]["response"])]
+
+
+def test_turn_is_saved_when_the_client_disconnects():
+    assistant = make_assistant(["Water the field at dawn. ", "Then check the soil moisture."])
+    stream = assistant.stream_chat("how do I irrigate?", "s")
+    assert next(stream)["event"] == "audio"
+    stream.close()
+    assert len(assistant.turns) == 1
+
+
+class FakeHandle:
+    def __init__(self, answer):
+        self.answer = answer
+
+    def run(self, payload):
+        return SimpleNamespace(data=self.answer)
+
+
+def test_llm_without_streaming_api_yields_one_chunk_and_is_counted():
+    llm = LLMModel.__new__(LLMModel)
+    llm.model_id = "no-stream"
+    llm.model = FakeHandle("First sentence here. Second sentence here.")
+    assert not llm.streams
+
+    assert list(llm.stream_response("hi")) == ["First sentence here. Second sentence here."]
+    assert LLM_STREAM_RESPONSES._values[("no-stream", "buffered")] == 1
+
+
+def test_done_event_reports_whether_the_llm_streamed():
+    assistant = make_assistant(["Water the field at dawn."])
+    assert list(assistant.stream_chat("q", "s"))[-1]["llm_streamed"] is True
+
+    assistant.llm.model.streams = False
+    assert list(assistant.stream_chat("q", "s"))[-1]["llm_streamed"] is False
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+
+from cultural_modern.water_conservation_analyzer import WaterConservationAnalyzer
+
+ANSWER = "```json\n" + json.dumps({
+    "traditional_practice": ["flood irrigation"],
+    "traditional_efficiency": ["40%"],
+    "traditional_description": ["fields are flooded"],
+    "modern_practice": ["drip irrigation"],
+    "improved_efficiency": ["90%"],
+    "modern_description": ["water goes to the roots"],
+}) + "\n```"
+
+
+class GatedLLM:
+    """Blocks every call until ``release`` is set, counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get_response(self, text, long_context=False):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return ANSWER
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_refresh_queued_behind_a_request_still_runs():
+    history = {"default": ["User: I flood my fields", "AI: try drip"]}
+    llm = GatedLLM()
+    analyzer = WaterConservationAnalyzer(llm_model=llm, history_provider=lambda session_id: history[session_id])
+
+    request = threading.Thread(target=analyzer.analyze_practices)
+    request.start()
+    assert llm.started.wait(5)
+
+    # A new turn lands while the request's analysis is still running
+    history["default"] = history["default"] + ["User: what about mulch?", "AI: it keeps moisture in"]
+    analyzer.refresh_in_background()
+    llm.release.set()
+    request.join(5)
+
+    wait_for(lambda: analyzer.cache_stats()["background_refreshes"] == 1 and not analyzer.cache_stats()["refreshing"])
+    assert llm.calls == 2
+    assert analyzer.cache_stats()["hits"] == 0
+    analyzer.analyze_practices()
+    assert analyzer.cache_stats()["hits"] == 1
+
+
+def test_refreshes_do_not_use_the_shared_model_executor():
+    from voice_assistant.async_models import get_executor
+
+    llm = GatedLLM()
+    llm.release.set()
+    analyzer = WaterConservationAnalyzer(llm_model=llm, history_provider=lambda session_id: ["User: hi"])
+    analyzer.refresh_in_background()
+    wait_for(lambda: not analyzer.cache_stats()["refreshing"])
+    assert analyzer._refresh_executor is not get_executor()
+    assert analyzer._refresh_executor._max_workers == analyzer.refresh_workers
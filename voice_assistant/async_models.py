@@ -0,0 +1,52 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on blocking SDK calls (aiXplain runs, LangChain chains) in flight per process
+MAX_WORKERS = int(os.getenv("VOICE_ASSISTANT_MAX_WORKERS", "16"))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared bounded executor for blocking model calls, recreated after a fork."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="model-call")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+class AsyncModelAdapter:
+    """Awaitable facade over a blocking model.
+
+    ``await adapter.method(...)`` uses the model's native coroutine ``a<method>``
+    when it has one (e.g. TTSModelEdge.aspeak) and otherwise runs the blocking
+    method on the shared executor.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattr__(self, name):
+        native = getattr(self.model, f"a{name}", None)
+        if native is not None and asyncio.iscoroutinefunction(native):
+            return native
+
+        method = getattr(self.model, name)
+
+        async def call(*args, **kwargs):
+            return await run_blocking(method, *args, **kwargs)
+
+        return call
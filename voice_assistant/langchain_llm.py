@@ -8,11 +8,11 @@ from pydantic import Field
 class CustomLLM(LLM):
     """Custom LangChain LLM Wrapper for LLMModel"""
 
-    model: LLMModel = Field(default_factory=LLMModel)  # Define model properly
+    model: Any = Field(default_factory=LLMModel)  # An LLMModel, or an LLMRouter over several
 
     def __init__(self, **kwargs):
+        # Pass model=<LLMModel> to share one instance; otherwise the default_factory creates one
         super().__init__(**kwargs)
-        self.model = LLMModel()  # Initialize your existing LLM
 
     @property
     def _llm_type(self) -> str:
@@ -29,11 +29,11 @@ class CustomLLM(LLM):
 class CustomLLM2(LLM):
     """Custom LangChain LLM Wrapper for LLMModel"""
 
-    model: LLMModel = Field(default_factory=LLMModel)  # Define model properly
+    model: Any = Field(default_factory=LLMModel)  # An LLMModel, or an LLMRouter over several
 
     def __init__(self, **kwargs):
+        # Pass model=<LLMModel> to share one instance; otherwise the default_factory creates one
         super().__init__(**kwargs)
-        self.model = LLMModel()  # Initialize your existing LLM
 
     @property
     def _llm_type(self) -> str:
@@ -0,0 +1,341 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from common import metrics
+from voice_assistant.streaming import speech_text
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated secondary model IDs, tried in order for hedges and when the primary's breaker is open
+LLM_FALLBACK_MODEL_IDS = os.getenv("LLM_FALLBACK_MODEL_IDS", "")
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "20"))
+LLM_LONG_DEADLINE = float(os.getenv("LLM_LONG_DEADLINE", "90"))
+# Hedge to the next model once the current call outlives this percentile of its recent latencies
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_ROUTER_WORKERS = int(os.getenv("LLM_ROUTER_WORKERS", "32"))
+
+MODEL_LATENCY = metrics.register(metrics.Histogram(
+    "llm_model_latency_seconds", "Latency of individual LLM calls by model", labels=("model", "context")
+))
+MODEL_CALLS = metrics.register(metrics.Counter(
+    "llm_model_calls_total", "LLM calls by model and outcome", labels=("model", "outcome")
+))
+ROUTER_EVENTS = metrics.register(metrics.Counter(
+    "llm_router_events_total", "Hedges, fallbacks and deadline misses", labels=("event",)
+))
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; lets one trial call through after ``reset_timeout``."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through, without taking the half-open trial."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            return self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened after %d failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window=256):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+class _Attempt:
+    """One call to one route; its outcome is recorded against the breaker exactly once."""
+
+    def __init__(self, route):
+        self.route = route
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def settle(self) -> bool:
+        """True for the first caller only: the finished call, or the deadline that gave up on it."""
+        with self._lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+
+class _Route:
+    def __init__(self, model, breaker):
+        self.model = model
+        self.model_id = getattr(model, "model_id", type(model).__name__)
+        self.breaker = breaker
+        self.latency = {False: LatencyTracker(), True: LatencyTracker()}  # keyed on long_context
+
+
+class LLMRouter:
+    """Drop-in for LLMModel that routes each call across a primary and secondary models.
+
+    Every call has a deadline. If the primary hasn't answered by its recent
+    ``hedge_percentile`` latency, the same request is also sent to the next
+    model and the first success wins (the loser finishes in the background).
+    A model whose breaker is open is skipped until its trial call succeeds,
+    and an error moves straight on to the next model.
+    """
+
+    def __init__(self, models, deadline=LLM_DEADLINE, long_deadline=LLM_LONG_DEADLINE,
+                 hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+                 failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET,
+                 max_workers=LLM_ROUTER_WORKERS):
+        if not models:
+            raise ValueError("LLMRouter needs at least one model")
+        self.routes = [_Route(model, CircuitBreaker(failure_threshold, reset_timeout)) for model in models]
+        self.deadline = deadline
+        self.long_deadline = long_deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._counters = {"calls": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "deadline_exceeded": 0}
+
+    @property
+    def model(self):
+        # The primary's SDK handle, for code that reaches through LLMModel.model
+        return self.routes[0].model.model
+
+    @property
+    def model_id(self):
+        return self.routes[0].model_id
+
+    @property
+    def streams(self) -> bool:
+        return getattr(self.routes[0].model, "streams", False)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Own pool rather than the shared model-call executor: callers often run on that one
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-route")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _count(self, name) -> None:
+        with self._lock:
+            self._counters[name] += 1
+        ROUTER_EVENTS.inc(name)
+
+    def _next_route(self, start):
+        # allow() is only asked of the route about to be called: it takes a half-open
+        # breaker's trial slot, which must be settled by that call's outcome
+        for index in range(start, len(self.routes)):
+            if self.routes[index].breaker.allow():
+                return index, self.routes[index]
+        return len(self.routes), None
+
+    def _has_next(self, start) -> bool:
+        return any(route.breaker.available() for route in self.routes[start:])
+
+    def _first_route(self):
+        index, route = self._next_route(0)
+        if route is None:
+            # Every breaker open: try the primary anyway rather than fail without a call
+            return 0, self.routes[0]
+        return index, route
+
+    def _hedge_delay(self, route, long_context):
+        tracker = route.latency[long_context]
+        if len(tracker) < self.hedge_min_samples:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    def _call(self, attempt, text, long_context):
+        route = attempt.route
+        start = time.perf_counter()
+        context = "long" if long_context else "short"
+        try:
+            result = route.model.get_response(text, long_context=long_context)
+        except Exception:
+            if attempt.settle():
+                route.breaker.record_failure()
+            MODEL_CALLS.inc(route.model_id, "error")
+            raise
+        seconds = time.perf_counter() - start
+        # A call that outlived the deadline was already recorded as a failure
+        if attempt.settle():
+            route.breaker.record_success()
+        route.latency[long_context].record(seconds)
+        MODEL_LATENCY.observe(seconds, route.model_id, context)
+        MODEL_CALLS.inc(route.model_id, "ok")
+        return result
+
+    def get_response(self, text, long_context=False):
+        self._count("calls")
+        deadline = time.monotonic() + (self.long_deadline if long_context else self.deadline)
+        executor = self._get_executor()
+
+        pending = {}
+        last_error = None
+
+        def start(route):
+            attempt = _Attempt(route)
+            pending[executor.submit(self._call, attempt, text, long_context)] = attempt
+
+        first_index, first_route = self._first_route()
+        next_index = first_index + 1
+        start(first_route)
+
+        def launch():
+            nonlocal next_index
+            next_index, route = self._next_route(next_index)
+            if route is None:
+                return False
+            next_index += 1
+            start(route)
+            return True
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            hedge_delay = None
+            if len(pending) == 1 and self._has_next(next_index):
+                attempt = next(iter(pending.values()))
+                hedge_delay = self._hedge_delay(attempt.route, long_context)
+            timeout = remaining if hedge_delay is None else min(remaining, hedge_delay)
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge_delay is not None and launch():
+                    self._count("hedges")
+                continue
+
+            for future in done:
+                route = pending.pop(future).route
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning("LLM %s failed: %s", route.model_id, e)
+                    continue
+                if route is not first_route:
+                    self._count("hedge_wins" if pending else "fallbacks")
+                return result
+
+            # Everything in flight failed: fall back to the next model, if any
+            if not pending:
+                launch()
+
+        if pending:
+            for attempt in pending.values():
+                if attempt.settle():
+                    attempt.route.breaker.record_failure()
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded(
+                f"No LLM answered within {self.long_deadline if long_context else self.deadline}s"
+            )
+        raise last_error
+
+    def stream_response(self, text, long_context=False):
+        # Streams aren't hedged: the first model whose breaker allows it streams the answer
+        _, route = self._first_route()
+        try:
+            yield from route.model.stream_response(text, long_context=long_context)
+        except Exception:
+            route.breaker.record_failure()
+            raise
+        route.breaker.record_success()
+
+    def get_response_for_audio(self, text):
+        raw_response = self.get_response(text)
+        return raw_response, speech_text(raw_response)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        models = {}
+        for route in self.routes:
+            entry = {"breaker": route.breaker.state, "consecutive_failures": route.breaker.failures}
+            for long_context, tracker in route.latency.items():
+                context = "long" if long_context else "short"
+                entry[context] = {
+                    "samples": len(tracker),
+                    "p50_ms": _ms(tracker.percentile(50)),
+                    "p95_ms": _ms(tracker.percentile(95)),
+                    "p99_ms": _ms(tracker.percentile(99)),
+                }
+            models[route.model_id] = entry
+        return {**counters, "models": models}
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=False)
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000.0
+
+
+def fallback_model_ids(spec=LLM_FALLBACK_MODEL_IDS) -> list:
+    return [model_id.strip() for model_id in spec.split(",") if model_id.strip()]
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from collections import deque
+
+import joblib
+
+from irrigation_plan.soil import SOIL_BASE_WATER
+
+logger = logging.getLogger(__name__)
+
+CULTURAL_PRACTICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'cultural_practices'))
+
+CROPS = [
+    "rice", "paddy", "wheat", "maize", "corn", "millet", "bajra", "jowar", "ragi", "sorghum", "barley",
+    "sugarcane", "cotton", "jute", "groundnut", "peanut", "soybean", "mustard", "sunflower", "sesame",
+    "chickpea", "bengal gram", "green gram", "black gram", "lentil", "pigeon pea", "tur", "moong", "urad", "potato", "onion", "tomato",
+    "brinjal", "chilli", "okra", "cabbage", "cauliflower", "banana", "mango", "coconut", "grapes",
+    "pomegranate", "tea", "coffee", "turmeric", "ginger", "vegetables", "fruits",
+]
+
+# Everyday words ("well", "tank", "gram") only count in compounds that pin them to farming
+IRRIGATION_METHODS = [
+    "drip irrigation", "sprinkler irrigation", "sprinkler", "flood irrigation", "furrow irrigation",
+    "basin irrigation", "canal irrigation", "micro irrigation", "subsurface irrigation", "irrigation",
+    "rainwater harvesting", "mulching", "mulch", "check dam", "farm pond", "percolation tank",
+    "irrigation tank", "water tank", "storage tank", "stepwell", "step well", "canal", "borewell",
+    "bore well", "tube well", "tubewell", "open well", "dug well", "irrigation well", "soil moisture sensor",
+]
+
+# Labels carried by each gazetteer section
+CROP = "Crop"
+SOIL = "Soil"
+FESTIVAL = "Festival"
+PRACTICE = "Practice"
+IRRIGATION = "IrrigationMethod"
+
+
+def _crop_forms(crop):
+    yield crop
+    yield crop + "s"
+    yield crop + "es"
+
+
+def build_gazetteer() -> dict:
+    """Surface form (lower case) -> label, from the soil table, the encoder classes and CROPS."""
+    gazetteer = {}
+    for crop in CROPS:
+        for form in _crop_forms(crop):
+            gazetteer[form] = CROP
+    for method in IRRIGATION_METHODS:
+        gazetteer[method] = IRRIGATION
+    for soil in SOIL_BASE_WATER:
+        gazetteer[soil] = SOIL
+        gazetteer[f"{soil} soil"] = SOIL
+    for name, label in (("festival_encoder.pkl", FESTIVAL), ("practice_encoder.pkl", PRACTICE)):
+        encoder = joblib.load(os.path.join(CULTURAL_PRACTICES_DIR, name))
+        for cls in encoder.classes_:
+            gazetteer[str(cls).lower()] = label
+    return gazetteer
+
+
+def _lower_in_place(text) -> str:
+    """Lower-case ``text`` one character at a time, so offsets into the result are offsets into ``text``."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(lower if len(lower) == 1 else char for char, lower in ((c, c.lower()) for c in text))
+
+
+class AhoCorasickMatcher:
+    """Multi-pattern matcher over lower-cased text, in a single pass whatever the pattern count.
+
+    Only whole-word matches are reported; where matches overlap, the leftmost
+    longest one wins.
+    """
+
+    def __init__(self, patterns):
+        # Node i: goto[i] maps char -> node, fail[i] is the suffix link, out[i] lists (length, label)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, label in patterns.items():
+            self._add(pattern.lower(), label)
+        self._link()
+
+    def _add(self, pattern, label) -> None:
+        node = 0
+        for char in pattern:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append((len(pattern), label))
+
+    def _link(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def _raw_matches(self, text):
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, label in self.out[node]:
+                yield end - length, end, label
+
+    def find(self, text):
+        """Return [(start, end, label)] in text order, whole words only, without overlaps.
+
+        Offsets index ``text`` itself: characters whose lower case is longer
+        than one character (e.g. "İ") are matched as they are.
+        """
+        lowered = _lower_in_place(text)
+        candidates = [
+            (start, end, label) for start, end, label in self._raw_matches(lowered)
+            if (start == 0 or not lowered[start - 1].isalnum()) and (end == len(lowered) or not lowered[end].isalnum())
+        ]
+        candidates.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        matches = []
+        last_end = 0
+        for start, end, label in candidates:
+            if start >= last_end:
+                matches.append((start, end, label))
+                last_end = end
+        return matches
+
+
+class LocalNERModel:
+    """Gazetteer NER for the farming domain; same [{span: label}] output as NERModel."""
+
+    def __init__(self, gazetteer=None):
+        self.matcher = AhoCorasickMatcher(gazetteer if gazetteer is not None else build_gazetteer())
+
+    def extract_entities(self, text):
+        return [{text[start:end]: label} for start, end, label in self.matcher.find(text)]
+
+
+_local_model = None
+_local_model_lock = threading.Lock()
+
+
+def get_local_ner() -> LocalNERModel:
+    """Process-wide LocalNERModel, built on first use (it is read-only afterwards)."""
+    global _local_model
+    if _local_model is None:
+        with _local_model_lock:
+            if _local_model is None:
+                _local_model = LocalNERModel()
+                logger.info("Local NER ready with %d trie nodes", len(_local_model.matcher.goto))
+    return _local_model
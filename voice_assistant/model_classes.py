@@ -1,64 +1,111 @@
 from dotenv import load_dotenv
 import os
 import re
+import sys
+import logging
 
 load_dotenv()
 
 os.environ["TEAM_API_KEY"]=os.getenv("AIXPLAIN_ACCESS_KEY")
 
-from aixplain.factories import ModelFactory
 import edge_tts
 import asyncio
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common import metrics
+from common.metrics import stage_timer, timed
+from common import http_client
+from voice_assistant.tts_cache import cache_key, get_tts_cache
+from voice_assistant.local_ner import get_local_ner
+from voice_assistant.streaming import speech_text
+# One handle per model ID per process, cached on disk across restarts (replaces ModelFactory.get)
+from voice_assistant.model_handles import get_model
+
+logger = logging.getLogger(__name__)
+
+LLM_STREAM_RESPONSES = metrics.register(metrics.Counter(
+    "llm_stream_responses_total",
+    "LLMModel.stream_response calls by whether the SDK streamed tokens or returned the whole answer",
+    labels=("model", "mode"),
+))
 
 # Automatic speech recognition model
 class ASRModel:
     def __init__(self):
-        self.model = ModelFactory.get("65eee94812ee0172b4a9a6f7")
+        self.model = get_model("65eee94812ee0172b4a9a6f7")
 
+    @timed("asr")
     def transcribe(self, audio_path):
-        print("ASR Transcribing audio...")
+        logger.debug("ASR transcribing %s", audio_path)
         
-        self.result = self.model.run({
+        # Keep results local so concurrent calls on one instance don't see each other's output
+        result = self.model.run({
             "source_audio": audio_path,
             "language": "en"
         })
-        print(f"ASR Transcription completed: {self.result.data}")
-        return self.result.data
+        self.result = result
+        logger.debug("ASR transcription completed: %s", result.data)
+        return result.data
 
 
+# "local" (gazetteer trie, no network), "remote" (aiXplain) or "local+remote" (remote only when local finds nothing)
+NER_BACKEND = os.getenv("NER_BACKEND", "local")
+
 # Named Entity Recognition model to pass to the vector database: English on Azure-Microsoft
 class NERModel:
-    def __init__(self):
-        self.model = ModelFactory.get("60ddefbc8d38c51c5885f8ba")
-    
+    def __init__(self, backend=None):
+        self.backend = backend or NER_BACKEND
+        if self.backend not in ("local", "remote", "local+remote"):
+            raise ValueError(f"Unknown NER backend: {self.backend}")
+        self.local_model = get_local_ner() if self.backend != "remote" else None
+        self.model = get_model("60ddefbc8d38c51c5885f8ba") if self.backend != "local" else None
+
+    @timed("ner")
     def extract_entities(self, text):
-        print("NER Extracting Entities...")
-        self.result = self.model.run({
+        if self.local_model is not None:
+            entities = self.local_model.extract_entities(text)
+            if entities or self.model is None:
+                self.entities = entities
+                logger.debug("Local NER extraction completed: %s", entities)
+                return entities
+        return self._extract_remote(text)
+
+    def _extract_remote(self, text):
+        logger.debug("NER extracting entities")
+        result = self.model.run({
             "text": text
         })
-        self.entities = []
-        for i in self.result.details:
+        entities = []
+        for i in result.details:
             # print(text[i['boundingBox']['start']: i['boundingBox']['end']])
             # print(i['data'])
-            self.entities.append({text[i['boundingBox']['start']: i['boundingBox']['end']]: i['data']})
+            entities.append({text[i['boundingBox']['start']: i['boundingBox']['end']]: i['data']})
+        self.result, self.entities = result, entities
         
         # Gives output in the format
         # [{'fertilizer': 'Product'},
         # {'irrigation': 'Skill'},
-        print(f"NER Extraction completed: {self.entities}")
-        return self.entities
+        logger.debug("NER extraction completed: %s", entities)
+        return entities
 
 
 # The GOD-LLM: Llama 3.3 70B Versatile on Groq
+LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "677c16166eb563bb611623c1")
+
 class LLMModel:
-    def __init__(self):
-        # self.model = ModelFactory.get("6646261c6eb563165658bbb1")
-        self.model = ModelFactory.get("677c16166eb563bb611623c1")
+    _warned_buffered = False
 
+    def __init__(self, model_id=None):
+        # self.model = get_model("6646261c6eb563165658bbb1")
+        self.model_id = model_id or LLM_MODEL_ID
+        self.model = get_model(self.model_id)
+
+    @timed("llm")
     def get_response(self, text, long_context=False):
-        print("LLM generating response")
+        logger.debug("LLM generating response")
         if long_context:
-            self.result = self.model.run({
+            result = self.model.run({
                 "text": text,
                 # "prompt": "<PROMPT_TEXT_DATA>",
                 # "context": "<CONTEXT_TEXT_DATA>",
@@ -69,32 +116,80 @@ class LLMModel:
                 # "history": "<HISTORY_TEXT_DATA>"
             })
         else:
-            self.result = self.model.run({"text": text, "max_tokens": "64"})
-        print("LLM has responded!")
-        return self.result.data
+            result = self.model.run({"text": text, "max_tokens": "64"})
+        self.result = result
+        logger.debug("LLM has responded")
+        return result.data
+
+    @property
+    def streams(self) -> bool:
+        """Whether the SDK handle can stream tokens (aiXplain 0.2.x has no streaming run)."""
+        return getattr(self.model, "run_stream", None) is not None
+
+    def stream_response(self, text, long_context=False):
+        """Yield the response text in chunks as the model produces them.
+
+        Only handles with a ``run_stream`` method stream. Otherwise, as with
+        the installed aiXplain SDK, the call blocks for the full generation
+        and the whole answer arrives as one chunk; each such call is counted
+        under mode="buffered" in llm_stream_responses_total.
+        """
+        if not self.streams:
+            LLM_STREAM_RESPONSES.inc(self.model_id, "buffered")
+            if not LLMModel._warned_buffered:
+                LLMModel._warned_buffered = True
+                logger.warning("LLM %s has no streaming API; responses arrive as a single chunk", self.model_id)
+            yield self.get_response(text, long_context=long_context)
+            return
+
+        LLM_STREAM_RESPONSES.inc(self.model_id, "streamed")
+        logger.debug("LLM streaming response")
+        with stage_timer("llm"):
+            for chunk in self.model.run_stream({"text": text, "max_tokens": "1024" if long_context else "64"}):
+                if getattr(chunk, "data", None):
+                    yield chunk.data
+        logger.debug("LLM has responded")
 
     def get_response_for_audio(self, text):
-        print("LLM generating response")
         raw_response = self.get_response(text)
-        clean_text = raw_response.replace("*", "")
-        print("LLM has responded!")
-        return raw_response, clean_text.strip()
+        return raw_response, speech_text(raw_response)
 
 # For using TTS: Speech Synthesis - English (Australia) - A-FEMALE - Google
 class TTSModelAixplain:
-    def __init__(self):
-        self.model = ModelFactory.get("6171efb6159531495cadf03d")
-    
+    VOICE = "6171efb6159531495cadf03d"
+
+    def __init__(self, cache=None):
+        self.model = get_model(self.VOICE)
+        # With a cache, repeated text is served from disk and the clip is returned as a local URL
+        self.cache = cache if cache is not None else get_tts_cache()
+
+    def _synthesize(self, text):
+        logger.debug("Conversion to speech")
+        result = self.model.run({"text": text})
+        self.result = result
+        logger.debug("Conversion to speech completed")
+        return result.data
+
+    def _download(self, text, temp_path):
+        audio_url = self._synthesize(text)
+        if not str(audio_url).startswith(("http://", "https://")):
+            raise ValueError(f"TTS returned no audio URL: {audio_url!r}")
+        response = http_client.get(audio_url)
+        response.raise_for_status()
+        with open(temp_path, "wb") as f:
+            f.write(response.content)
+
+    @timed("tts")
     def speak(self, text):
-        print("Conversion to speech...")
-        self.result = self.model.run({"text": text})
-        print("Conversion to Speech Completed!")
-        return self.result.data
+        if self.cache is None:
+            return self._synthesize(text)
+        path = self.cache.get_or_create(text, self.VOICE, lambda temp_path: self._download(text, temp_path))
+        return self.cache.location(path)
 
 
 # TTS Using Edge_TTS
 class TTSModelEdge:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.VOICES = [
             # Australian English
             'en-AU-NatashaNeural',  # Female
@@ -120,18 +215,37 @@ class TTSModelEdge:
         ]
         
         self.VOICE = self.VOICES[10]
-        self.OUTPUT_PATH = "output.mp3"
-    
-    def speak(self, text):
-        print("Conversion to speech...")
+        self.cache = cache if cache is not None else get_tts_cache()
+
+    async def _save(self, text, output_path):
+        logger.debug("Conversion to speech")
+        with stage_timer("tts"):
+            communicate = edge_tts.Communicate(text, self.VOICE)
+            await communicate.save(output_path)
+        logger.debug("Conversion to speech completed")
+        return output_path
+
+    async def aspeak(self, text, output_path=None):
+        """Synthesize to output_path, or to the cache (or a unique file) when none is given."""
         self.TEXT = text
-        async def amain() -> None:
-            communicate = edge_tts.Communicate(self.TEXT, self.VOICE)
-            await communicate.save(self.OUTPUT_PATH)
-
-        loop=asyncio.get_event_loop_policy().get_event_loop()
-        try:
-            loop.run_until_complete(amain())
-        finally:
-            loop.close()
-        print("Conversion to Speech Completed!")
\ No newline at end of file
+        if output_path is not None:
+            return await self._save(text, output_path)
+        if self.cache is None:
+            # Never a shared name: concurrent requests would overwrite each other's audio
+            return await self._save(text, f"output_{uuid.uuid4().hex}.mp3")
+
+        key = cache_key(text, self.VOICE)
+        path = self.cache.lookup(key)
+        if path is None:
+            temp_path = self.cache.temp_path(key)
+            try:
+                await self._save(text, temp_path)
+            except Exception:
+                self.cache.discard(temp_path)
+                raise
+            path = self.cache.commit(key, temp_path)
+        return self.cache.location(path)
+
+    def speak(self, text, output_path=None):
+        # asyncio.run gives every call a fresh loop, so repeated calls in one thread work
+        return asyncio.run(self.aspeak(text, output_path=output_path))
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""One aiXplain model handle per model ID per process, rebuilt from cached metadata across restarts.
+
+The first time a model ID is resolved, its metadata JSON is fetched from the
+same endpoint ModelFactory.get() uses and written to the index at
+MODEL_HANDLE_CACHE_DIR/models.json, next to the SDK's own
+function/language/license cache, with the fetch time and aiXplain version.
+Later processes build the handle locally from that JSON with the SDK's
+create_model_from_response(), the constructor ModelFactory.get() itself
+ends in, so a restart within MODEL_HANDLE_CACHE_TTL on the same SDK version
+makes no network calls to resolve models. Entries that are older or from
+another SDK version are fetched again.
+
+Only JSON is persisted: the API key is stripped before writing and filled in
+from TEAM_API_KEY when the handle is built. No handle, session or pickle
+ever touches the disk. With MODEL_HANDLE_CACHE=0 handles come straight from
+ModelFactory.get() and nothing is written.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are still atomic, but concurrent workers may drop an entry
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_HANDLE_CACHE = os.getenv("MODEL_HANDLE_CACHE", "1") == "1"
+MODEL_HANDLE_CACHE_DIR = os.getenv("MODEL_HANDLE_CACHE_DIR", ".aixplain_cache")
+MODEL_HANDLE_CACHE_TTL = float(os.getenv("MODEL_HANDLE_CACHE_TTL", str(24 * 3600)))
+MODEL_HANDLE_PREFETCH_WORKERS = int(os.getenv("MODEL_HANDLE_PREFETCH_WORKERS", "8"))
+
+INDEX_NAME = "models.json"
+
+_handles = {}
+_locks = {}
+_lock = threading.Lock()
+_counters = {"memory_hits": 0, "index_hits": 0, "fetches": 0, "prefetched": 0, "build_errors": 0, "index_errors": 0}
+
+
+def aixplain_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("aiXplain")
+    except Exception:
+        import aixplain
+        return getattr(aixplain, "__version__", "unknown")
+
+
+def _count(name) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+class ModelIndex:
+    """JSON index of model metadata keyed on model ID, with fetch time and SDK version."""
+
+    def __init__(self, directory=MODEL_HANDLE_CACHE_DIR, ttl=MODEL_HANDLE_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.path = os.path.join(directory, INDEX_NAME)
+        self._version = None
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = aixplain_version()
+        return self._version
+
+    def read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("models", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def is_fresh(self, entry) -> bool:
+        return (
+            isinstance(entry.get("response"), dict)
+            and entry.get("aixplain_version") == self.version
+            and time.time() - entry.get("timestamp", 0) <= self.ttl
+        )
+
+    def fresh_ids(self) -> list:
+        return [model_id for model_id, entry in self.read().items() if self.is_fresh(entry)]
+
+    def get(self, model_id):
+        """Cached metadata for ``model_id``, or None if missing or stale."""
+        entry = self.read().get(model_id)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        return entry["response"]
+
+    def record(self, model_id, response) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "name": response.get("name"),
+            "timestamp": time.time(),
+            "aixplain_version": self.version,
+            "response": {key: value for key, value in response.items() if key != "api_key"},
+        }
+        # Read-modify-write under an exclusive lock so concurrent workers don't drop each other's entries
+        with open(f"{self.path}.lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            models = self.read()
+            models[model_id] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"models": models}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+_index = ModelIndex() if MODEL_HANDLE_CACHE else None
+
+
+def _fetch(model_id):
+    from aixplain.factories import ModelFactory
+    return ModelFactory.get(model_id)
+
+
+def _fetch_response(model_id) -> dict:
+    """The model's metadata JSON, from the endpoint ModelFactory.get() reads."""
+    from urllib.parse import urljoin
+
+    from aixplain.factories import ModelFactory
+    from aixplain.utils import config
+    from aixplain.utils.file_utils import _request_with_retry
+
+    url = urljoin(ModelFactory.backend_url, f"sdk/models/{model_id}")
+    headers = {"Authorization": f"Token {config.TEAM_API_KEY}", "Content-Type": "application/json"}
+    r = _request_with_retry("get", url, headers=headers)
+    if not 200 <= r.status_code < 300:
+        raise Exception(f"Model GET Error: Failed to retrieve model {model_id}. Status Code: {r.status_code}")
+    return r.json()
+
+
+def _build(response):
+    from aixplain.factories.model_factory.utils import create_model_from_response
+    from aixplain.utils import config
+    return create_model_from_response({**response, "api_key": config.TEAM_API_KEY})
+
+
+def _resolve(model_id):
+    if _index is None:
+        handle = _fetch(model_id)
+        _count("fetches")
+        logger.info("Fetched model %s", model_id)
+        return handle
+
+    response = _index.get(model_id)
+    if response is not None:
+        try:
+            handle = _build(response)
+            _count("index_hits")
+            return handle
+        except Exception as e:
+            # Metadata the installed SDK can't build from: refetch below
+            _count("build_errors")
+            logger.warning("Could not build model %s from cached metadata: %s", model_id, e)
+
+    response = _fetch_response(model_id)
+    handle = _build(response)
+    _count("fetches")
+    logger.info("Fetched model %s", model_id)
+    try:
+        _index.record(model_id, response)
+    except Exception as e:
+        _count("index_errors")
+        logger.warning("Could not record model %s in the index: %s", model_id, e)
+    return handle
+
+
+def get_model(model_id):
+    """Return the process-wide handle for ``model_id``, from cached metadata when fresh, else fetched."""
+    handle = _handles.get(model_id)
+    if handle is not None:
+        _count("memory_hits")
+        return handle
+
+    with _lock:
+        model_lock = _locks.setdefault(model_id, threading.Lock())
+    with model_lock:
+        handle = _handles.get(model_id)
+        if handle is not None:
+            _count("memory_hits")
+            return handle
+        handle = _resolve(model_id)
+        _handles[model_id] = handle
+        return handle
+
+
+def prefetch(model_ids=None, workers=MODEL_HANDLE_PREFETCH_WORKERS) -> int:
+    """Resolve ``model_ids`` (default: every fresh model in the index) concurrently; return how many resolved.
+
+    Fresh entries are built from the index without network calls, so this is
+    cheap enough to run in a preforking master before the warm-up.
+    """
+    if model_ids is None:
+        model_ids = _index.fresh_ids() if _index is not None else []
+    model_ids = [model_id for model_id in model_ids if model_id not in _handles]
+    if not model_ids:
+        return 0
+
+    def resolve(model_id):
+        try:
+            get_model(model_id)
+            return True
+        except Exception as e:
+            logger.warning("Prefetch of model %s failed: %s", model_id, e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(model_ids))), thread_name_prefix="model-prefetch") as pool:
+        resolved = sum(pool.map(resolve, model_ids))
+    with _lock:
+        _counters["prefetched"] += resolved
+    return resolved
+
+
+def prefetch_in_background(model_ids=None) -> threading.Thread:
+    thread = threading.Thread(target=prefetch, args=(model_ids,), name="model-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+def stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+    return {**counters, "handles": len(_handles), "index": _index is not None}
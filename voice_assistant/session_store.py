@@ -0,0 +1,169 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+DEFAULT_SESSION_ID = "default"
+
+# Messages are stored as (role, content) tuples rather than LangChain message objects
+USER = 0
+AI = 1
+
+
+def to_langchain_messages(messages) -> list:
+    return [
+        HumanMessage(content=content) if role == USER else AIMessage(content=content)
+        for role, content in messages
+    ]
+
+
+class _Session:
+    __slots__ = ("messages", "ids", "summary", "last_access", "lock")
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.ids = deque(maxlen=max_messages)
+        self.summary = None
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class HistoryBackend:
+    """Interface for conversation history stores.
+
+    Messages are (role, content) tuples in chronological order.
+    """
+
+    def append_turn(self, session_id, query: str, response: str) -> None:
+        raise NotImplementedError
+
+    def get_messages(self, session_id, k_turns=None) -> list:
+        raise NotImplementedError
+
+    def get_page(self, session_id, limit: int, offset: int = 0):
+        """Return (messages, total): up to ``limit`` messages ending ``offset`` messages before the newest."""
+        raise NotImplementedError
+
+    def get_messages_with_ids(self, session_id) -> list:
+        """All stored messages as (id, role, content); ids only ever increase and are never reused."""
+        raise NotImplementedError
+
+    def get_summary(self, session_id):
+        """Return the conversation summary as (text, id of the newest message folded in), or None."""
+        raise NotImplementedError
+
+    def put_summary(self, session_id, text: str, last_message_id: int) -> bool:
+        """Store a summary unless one covering newer messages is already there; return whether it was stored."""
+        raise NotImplementedError
+
+    def clear(self, session_id=None) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+    def get_langchain_messages(self, session_id, k_turns=None) -> list:
+        return to_langchain_messages(self.get_messages(session_id, k_turns))
+
+
+class SessionStore(HistoryBackend):
+    """Bounded in-process per-session conversation memory.
+
+    Holds at most ``max_sessions`` sessions, evicting the least recently used
+    one when full and any session idle for longer than ``idle_timeout``
+    seconds. Each session keeps its last ``max_turns`` turns. The store lock
+    only guards the session table; reads and writes of a session's messages
+    take that session's own lock.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 3600, max_turns: int = 50):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._ids = itertools.count(1)
+
+    def _evict(self, now) -> None:
+        # Called with self._lock held; the table is ordered by last access
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._evictions += 1
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access <= self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            self._evictions += 1
+
+    def _session(self, session_id, create: bool):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[session_id] = _Session(2 * self.max_turns)
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+        return session
+
+    def append_turn(self, session_id, query: str, response: str) -> None:
+        session = self._session(session_id, create=True)
+        with session.lock:
+            session.messages.append((USER, query))
+            session.messages.append((AI, response))
+            session.ids.append(next(self._ids))
+            session.ids.append(next(self._ids))
+
+    def get_messages(self, session_id, k_turns=None) -> list:
+        session = self._session(session_id, create=False)
+        if session is None:
+            return []
+        with session.lock:
+            messages = list(session.messages)
+        if k_turns is None:
+            return messages
+        return messages[-2 * k_turns:] if k_turns > 0 else []
+
+    def get_messages_with_ids(self, session_id) -> list:
+        session = self._session(session_id, create=False)
+        if session is None:
+            return []
+        with session.lock:
+            return [(message_id, role, content) for message_id, (role, content) in zip(session.ids, session.messages)]
+
+    def get_summary(self, session_id):
+        session = self._session(session_id, create=False)
+        return None if session is None else session.summary
+
+    def put_summary(self, session_id, text: str, last_message_id: int) -> bool:
+        session = self._session(session_id, create=True)
+        with session.lock:
+            if session.summary is not None and session.summary[1] >= last_message_id:
+                return False
+            session.summary = (text, last_message_id)
+            return True
+
+    def get_page(self, session_id, limit: int, offset: int = 0):
+        messages = self.get_messages(session_id)
+        end = max(len(messages) - offset, 0)
+        return messages[max(end - limit, 0):end], len(messages)
+
+    def clear(self, session_id=None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "evictions": self._evictions}
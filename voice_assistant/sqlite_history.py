@@ -0,0 +1,238 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from voice_assistant.session_store import HistoryBackend, USER, AI
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    last_message_id INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class SQLiteHistoryStore(HistoryBackend):
+    """Append-only conversation history in a WAL-mode SQLite file.
+
+    Any number of worker processes can share one database. Appends are
+    buffered and written in one transaction every ``flush_interval`` seconds
+    (or once ``batch_size`` messages are pending); a process always flushes
+    its own buffer before reading, so it sees its own writes. Rows are only
+    ever deleted by compact(), which the flusher thread also runs every
+    ``compact_interval`` seconds when one is set. Rolling conversation
+    summaries are kept in the same file, so every worker shares them.
+    """
+
+    def __init__(self, path="conversation_history.db", batch_size=64, flush_interval=0.05, timeout=5.0,
+                 compact_interval=None, max_turns_per_session=None, max_age=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.compact_interval = compact_interval
+        self.max_turns_per_session = max_turns_per_session
+        self.max_age = max_age
+
+        self._local = threading.local()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        self._writes = 0
+        self._flushes = 0
+
+        db = self._connection()
+        db.executescript(_SCHEMA)
+        db.commit()
+
+    def _connection(self):
+        # One connection per thread and per process
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return
+        with self._pending_lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return
+            # Drop anything inherited from the parent process's buffer
+            self._pending = []
+            self._flusher = threading.Thread(target=self._flush_loop, name="history-flusher", daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        last_compaction = time.monotonic()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning("History flush failed: %s", e)
+
+            if self.compact_interval and time.monotonic() - last_compaction >= self.compact_interval:
+                last_compaction = time.monotonic()
+                try:
+                    deleted = self.compact(self.max_turns_per_session, self.max_age)
+                    if deleted:
+                        logger.info("History compaction removed %d messages", deleted)
+                except sqlite3.Error as e:
+                    logger.warning("History compaction failed: %s", e)
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            db = self._connection()
+            with db:
+                db.executemany(
+                    "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)", rows
+                )
+            self._writes += len(rows)
+            self._flushes += 1
+
+    def append_turn(self, session_id, query: str, response: str) -> None:
+        self._ensure_flusher()
+        now = time.time()
+        with self._pending_lock:
+            self._pending.append((session_id, USER, query, now))
+            self._pending.append((session_id, AI, response, now))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def get_messages(self, session_id, k_turns=None) -> list:
+        self.flush()
+        db = self._connection()
+        if k_turns is None:
+            rows = db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            return rows
+        if k_turns <= 0:
+            return []
+        rows = db.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, 2 * k_turns),
+        ).fetchall()
+        return rows[::-1]
+
+    def get_messages_with_ids(self, session_id) -> list:
+        self.flush()
+        return self._connection().execute(
+            "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+
+    def get_summary(self, session_id):
+        row = self._connection().execute(
+            "SELECT text, last_message_id FROM summaries WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put_summary(self, session_id, text: str, last_message_id: int) -> bool:
+        db = self._connection()
+        with db:
+            # Another worker may have folded further already; never move a summary backwards
+            cursor = db.execute(
+                """
+                INSERT INTO summaries (session_id, text, last_message_id, updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    text = excluded.text, last_message_id = excluded.last_message_id, updated = excluded.updated
+                WHERE excluded.last_message_id > summaries.last_message_id
+                """,
+                (session_id, text, last_message_id, time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def get_page(self, session_id, limit: int, offset: int = 0):
+        self.flush()
+        db = self._connection()
+        rows = db.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (session_id, limit, offset),
+        ).fetchall()
+        total = db.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+        return rows[::-1], total
+
+    def clear(self, session_id=None) -> None:
+        self.flush()
+        db = self._connection()
+        with db:
+            if session_id is None:
+                db.execute("DELETE FROM messages")
+                db.execute("DELETE FROM summaries")
+            else:
+                db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                db.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+    def compact(self, max_turns_per_session=None, max_age=None) -> int:
+        """Drop messages older than ``max_age`` seconds and all but each session's last turns."""
+        self.flush()
+        db = self._connection()
+        deleted = 0
+        with db:
+            if max_age is not None:
+                deleted += db.execute("DELETE FROM messages WHERE created < ?", (time.time() - max_age,)).rowcount
+                db.execute("DELETE FROM summaries WHERE updated < ?", (time.time() - max_age,))
+            if max_turns_per_session is not None:
+                deleted += db.execute(
+                    """
+                    DELETE FROM messages WHERE id IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id DESC) AS rn
+                            FROM messages
+                        ) WHERE rn > ?
+                    )
+                    """,
+                    (2 * max_turns_per_session,),
+                ).rowcount
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.execute("PRAGMA optimize")
+        return deleted
+
+    def close(self) -> None:
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"pending": pending, "writes": self._writes, "flushes": self._flushes}
+
+
+if __name__ == "__main__":
+    # python -m voice_assistant.sqlite_history [path] --max-turns N --max-age SECONDS
+    parser = argparse.ArgumentParser(description="Compact the conversation history database")
+    parser.add_argument("path", nargs="?", default=os.getenv("HISTORY_DB_PATH", "conversation_history.db"))
+    parser.add_argument("--max-turns", type=int, default=None, help="turns to keep per session")
+    parser.add_argument("--max-age", type=float, default=None, help="seconds of history to keep")
+    args = parser.parse_args()
+
+    store = SQLiteHistoryStore(args.path)
+    print(f"Removed {store.compact(args.max_turns, args.max_age)} messages from {args.path}")
@@ -0,0 +1,40 @@
+import re
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes/brackets) and whitespace
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+
+def speech_text(text: str) -> str:
+    """Text as it is sent to TTS, with markdown emphasis stripped."""
+    return text.replace("*", "").strip()
+
+
+class SentenceSplitter:
+    """Incrementally splits streamed LLM text into complete sentences.
+
+    Sentences shorter than ``min_chars`` are held back and merged with the
+    next one, so abbreviations and one-word fragments don't become their own
+    TTS requests.
+    """
+
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
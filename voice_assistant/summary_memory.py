@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import metrics
+from voice_assistant.session_store import USER
+
+logger = logging.getLogger(__name__)
+
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "2000"))
+MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", "150"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+# Threads for background summary LLM calls; kept off the shared model executor that requests wait on
+MEMORY_SUMMARY_WORKERS = int(os.getenv("MEMORY_SUMMARY_WORKERS", "2"))
+
+PROMPT_TOKENS = metrics.register(metrics.Histogram(
+    "prompt_tokens", "Estimated prompt size in tokens", labels=("prompt",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+))
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a farmer and an assistant that gives water conservation advice.
+Keep the farmer's crops, soil, location, traditional practices, concerns and any advice already given. Write at most {words} words and return only the summary.
+
+Current summary: {summary}
+
+New conversation turns:
+{turns}
+"""
+
+
+def estimate_tokens(text) -> int:
+    # ~4 characters per token for English; no tokenizer for the hosted model is available here
+    return (len(text) + 3) // 4
+
+
+def render_turns(messages) -> str:
+    return "\n".join(f"{'User' if role == USER else 'AI'}: {content}" for role, content in messages)
+
+
+def record_prompt_size(prompt, text) -> int:
+    tokens = estimate_tokens(text)
+    PROMPT_TOKENS.observe(tokens, prompt)
+    return tokens
+
+
+class RollingSummaryMemory:
+    """Last ``recent_turns`` turns verbatim plus an LLM-written summary of everything older.
+
+    The summary is brought up to date by update_in_background() after each
+    turn, so building a prompt never waits for the LLM. context() keeps the
+    summary and recent turns within ``token_budget`` (estimated), dropping
+    the oldest verbatim turns first and then cutting the summary.
+    Summaries are stored by the history backend, next to the messages, so
+    workers sharing a SQLite history share them too. Each records the ID of
+    the newest message folded in; only messages after it are folded next.
+    """
+
+    def __init__(self, llm_model, history_store, recent_turns=MEMORY_RECENT_TURNS, token_budget=MEMORY_TOKEN_BUDGET,
+                 summary_words=MEMORY_SUMMARY_WORDS, max_sessions=MEMORY_MAX_SESSIONS,
+                 summary_workers=MEMORY_SUMMARY_WORKERS):
+        self.llm_model = llm_model
+        self.history_store = history_store
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_words = summary_words
+        self.max_sessions = max_sessions
+        self.summary_workers = summary_workers
+
+        self._update_locks = OrderedDict()  # Serializes updates of a session within this process
+        self._lock = threading.Lock()
+        self._updating = set()
+        self._pending = set()
+        self._executor = None
+        self._executor_pid = None
+        self._counters = {"updates": 0, "update_errors": 0, "turns_folded": 0, "trimmed_prompts": 0, "superseded": 0}
+
+    def _update_lock(self, session_id) -> threading.Lock:
+        with self._lock:
+            lock = self._update_locks.get(session_id)
+            if lock is None:
+                lock = self._update_locks[session_id] = threading.Lock()
+            self._update_locks.move_to_end(session_id)
+            while len(self._update_locks) > self.max_sessions:
+                self._update_locks.popitem(last=False)
+            return lock
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.summary_workers, thread_name_prefix="memory-summary"
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def update(self, session_id) -> None:
+        """Fold turns that fell out of the verbatim window into the session's summary."""
+        with self._update_lock(session_id):
+            messages = self.history_store.get_messages_with_ids(session_id)
+            older = messages[:-2 * self.recent_turns] if self.recent_turns > 0 else messages
+            summary_text, last_folded = self.history_store.get_summary(session_id) or ("", 0)
+            new = [(role, content) for message_id, role, content in older if message_id > last_folded]
+            if not new:
+                return
+            prompt = SUMMARY_PROMPT.format(
+                words=self.summary_words, summary=summary_text or "(none yet)", turns=render_turns(new)
+            )
+            record_prompt_size("memory_summary", prompt)
+            text = self.llm_model.get_response(prompt, long_context=True)
+            stored = self.history_store.put_summary(session_id, (text or "").strip(), older[-1][0])
+        if not stored:
+            # Another worker folded the same turns first
+            self._counters["superseded"] += 1
+            return
+        self._counters["updates"] += 1
+        self._counters["turns_folded"] += len(new) // 2
+
+    def update_in_background(self, session_id) -> None:
+        """Schedule update() on the summary pool; calls made while one is running collapse into one follow-up."""
+        with self._lock:
+            if session_id in self._updating:
+                self._pending.add(session_id)
+                return
+            self._updating.add(session_id)
+
+        def run():
+            try:
+                self.update(session_id)
+            except Exception as e:
+                self._counters["update_errors"] += 1
+                logger.warning("Summary update failed for %s: %s", session_id, e)
+            finally:
+                with self._lock:
+                    self._updating.discard(session_id)
+                    again = session_id in self._pending
+                    self._pending.discard(session_id)
+                if again:
+                    self.update_in_background(session_id)
+
+        self._get_executor().submit(run)
+
+    def context(self, session_id, reserved_tokens=0):
+        """Return (summary, recent messages) fitting ``token_budget - reserved_tokens``.
+
+        ``reserved_tokens`` covers the rest of the prompt (system text, the query).
+        """
+        summary_text, _ = self.history_store.get_summary(session_id) or ("", 0)
+        recent = self.history_store.get_messages(session_id, self.recent_turns)
+
+        budget = self.token_budget - reserved_tokens
+        recent_tokens = [estimate_tokens(content) for _, content in recent]
+        total = estimate_tokens(summary_text) + sum(recent_tokens)
+        trimmed = False
+        # Drop whole turns from the front, but always keep the latest one
+        while total > budget and len(recent) > 2:
+            total -= recent_tokens[0] + recent_tokens[1]
+            recent, recent_tokens = recent[2:], recent_tokens[2:]
+            trimmed = True
+        if total > budget and summary_text:
+            keep_chars = max(0, (budget - sum(recent_tokens)) * 4)
+            summary_text = summary_text[:keep_chars]
+            trimmed = True
+        if trimmed:
+            self._counters["trimmed_prompts"] += 1
+        return summary_text, recent
+
+    def render(self, session_id, reserved_tokens=0) -> str:
+        """Summary and recent turns as plain text, for single-string prompts."""
+        summary_text, recent = self.context(session_id, reserved_tokens)
+        parts = []
+        if summary_text:
+            parts.append(f"Summary of earlier conversation: {summary_text}")
+        if recent:
+            parts.append(f"Recent conversation:\n{render_turns(recent)}")
+        return "\n\n".join(parts)
+
+    def clear(self, session_id=None) -> None:
+        # The stored summary goes with the history itself (HistoryBackend.clear)
+        with self._lock:
+            if session_id is None:
+                self._update_locks.clear()
+            else:
+                self._update_locks.pop(session_id, None)
+
+    def close(self) -> None:
+        """Let queued and running summary updates finish, then stop the pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "sessions": len(self._update_locks), "updating": len(self._updating)}
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE = os.getenv("TTS_CACHE", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Cached audio is returned as <prefix>/<file name> (served by models.py at /audio); empty returns the local path
+TTS_CACHE_URL_PREFIX = os.getenv("TTS_CACHE_URL_PREFIX", "/audio")
+
+
+def cache_key(text, voice) -> str:
+    return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Content-addressed audio files on disk, evicted least-recently-used past ``max_bytes``.
+
+    A clip is stored as ``<sha256(voice, text)><suffix>``, so identical text in
+    the same voice is synthesized once. Misses are written to a unique temp
+    file and renamed into place, so concurrent requests (and worker processes
+    sharing the directory) never see a half-written file. Recency is the file
+    mtime, bumped on every hit.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, url_prefix=TTS_CACHE_URL_PREFIX,
+                 suffix=".mp3"):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.url_prefix = url_prefix.rstrip("/") if url_prefix else ""
+        self.suffix = suffix
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._sizes = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+        for name, size in self._scan():
+            self._sizes[name] = size
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffix):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # Evicted by another worker mid-scan
+                    entries.append((entry.name, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return [(name, size) for name, size, _ in entries]
+
+    def path_for(self, key) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def location(self, path) -> str:
+        """What the TTS models return for a cached clip: a URL under url_prefix, or the path."""
+        if self.url_prefix:
+            return f"{self.url_prefix}/{os.path.basename(path)}"
+        return path
+
+    def lookup(self, key):
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+        return path
+
+    def temp_path(self, key) -> str:
+        return os.path.join(self.directory, f".{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+
+    def commit(self, key, temp_path) -> str:
+        """Atomically move a finished temp file into the cache and evict if over budget."""
+        path = self.path_for(key)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._sizes[os.path.basename(path)] = size
+            over_budget = sum(self._sizes.values()) > self.max_bytes
+        if over_budget:
+            self._evict()
+        return path
+
+    def discard(self, temp_path) -> None:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        # Rescan so files written by other workers count towards the budget too
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size in entries)
+            for name, size in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    self._counters["evictions"] += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._sizes = {name: size for name, size in entries if os.path.exists(os.path.join(self.directory, name))}
+
+    def get_or_create(self, text, voice, synthesize) -> str:
+        """Return the cached clip for (text, voice), calling ``synthesize(temp_path)`` on a miss.
+
+        Concurrent misses for the same clip in this process wait on one synthesis.
+        """
+        key = cache_key(text, voice)
+        path = self.lookup(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        temp_path = self.temp_path(key)
+        try:
+            synthesize(temp_path)
+            path = self.commit(key, temp_path)
+            future.set_result(path)
+            return path
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            self.discard(temp_path)
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._sizes), "bytes": sum(self._sizes.values())}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Process-wide cache configured from TTS_CACHE_*; None when TTS_CACHE=0."""
+    global _cache
+    if not TTS_CACHE:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache()
+    return _cache
@@ -1,20 +1,40 @@
+import asyncio
+import logging
 import threading
+from collections import deque
 from datetime import datetime
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableLambda
 from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferWindowMemory
 from voice_assistant.model_classes import ASRModel, NERModel, TTSModelEdge, TTSModelAixplain
 from voice_assistant.langchain_llm import CustomLLM  # Importing CustomLLM
+from voice_assistant.async_models import AsyncModelAdapter, get_executor, run_blocking
+from voice_assistant.streaming import SentenceSplitter, speech_text
+from voice_assistant.session_store import SessionStore, DEFAULT_SESSION_ID, USER, to_langchain_messages
+from voice_assistant.summary_memory import estimate_tokens, record_prompt_size
+
+logger = logging.getLogger(__name__)
+
+def format_history(messages) -> list:
+    """Render (role, content) messages as the [{"User": ...}, {"AI": ...}] list served by /get_conversation_history."""
+    return [{"User": content} if role == USER else {"AI": content} for role, content in messages]
 
 class VoiceAssistant:
-    def __init__(self, max_memory_window: int = 10):
+    def __init__(self, max_memory_window: int = 10, llm_model=None, session_store=None, on_turn=None, memory=None):
+        self.llm_model = llm_model
+        # A RollingSummaryMemory replaces the max_memory_window verbatim turns with a summary plus recent turns
+        self.memory = memory
+        # on_turn(session_id) runs after every saved turn, e.g. to refresh analyses derived from the history
+        self.on_turn = on_turn
+        self.max_memory_window = max_memory_window
         self.asr_model = None
         self.ner_model = None
         self.llm = None
         self.tts_model = None
         self._initialize_models()
+        self.async_asr_model = AsyncModelAdapter(self.asr_model)
+        self.async_tts_model = AsyncModelAdapter(self.tts_model)
         
         current_date = datetime.now().strftime("%B %d, %Y")
 
@@ -23,11 +43,8 @@ class VoiceAssistant:
         Current date: {current_date}.
         """
 
-        self.memory = ConversationBufferWindowMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            k=max_memory_window
-        )
+        # Conversation memory is per session; the prompt sees the last max_memory_window turns
+        self.sessions = session_store if session_store is not None else SessionStore()
 
         self.prompt_template = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
@@ -47,14 +64,13 @@ class VoiceAssistant:
         self.chain = LLMChain(
             llm=self.llm_runnable,
             prompt=self.prompt_template,
-            memory=self.memory,
-            verbose=True
+            verbose=logger.isEnabledFor(logging.DEBUG)
         )
 
     def _initialize_models(self) -> None:
         def init_asr(): self.asr_model = ASRModel()
         def init_ner(): self.ner_model = NERModel()
-        def init_llm(): self.llm = CustomLLM()
+        def init_llm(): self.llm = CustomLLM(model=self.llm_model) if self.llm_model is not None else CustomLLM()
         def init_tts(): self.tts_model = TTSModelAixplain()
 
         threads = [
@@ -69,75 +85,157 @@ class VoiceAssistant:
         for thread in threads:
             thread.join()
 
-    def forward(self, audio_path):
-        audio_to_text = self.asr_model.transcribe(audio_path)
+    def _extract_entities(self, text):
+        # NER is best effort: a failure must not cost the user their answer
+        try:
+            return self.ner_model.extract_entities(text)
+        except Exception as e:
+            logger.warning("NER failed: %s", e)
+            return None
+
+    def _chain_inputs(self, query, session_id):
+        if self.memory is None:
+            chat_history = self.sessions.get_langchain_messages(session_id, self.max_memory_window)
+        else:
+            summary, recent = self.memory.context(
+                session_id, reserved_tokens=estimate_tokens(self.system_prompt) + estimate_tokens(query)
+            )
+            chat_history = to_langchain_messages(recent)
+            if summary:
+                chat_history.insert(0, SystemMessage(content=f"Summary of earlier conversation: {summary}"))
+        record_prompt_size(
+            "voice_assistant", self.system_prompt + query + "".join(message.content for message in chat_history)
+        )
+        return {
+            "query": query,
+            "chat_history": chat_history,
+        }
+
+    def _append_turn(self, session_id, query, response):
+        self.sessions.append_turn(session_id, query, response)
+        if self.memory is not None:
+            self.memory.update_in_background(session_id)
+        if self.on_turn is not None:
+            try:
+                self.on_turn(session_id)
+            except Exception as e:
+                logger.warning("on_turn callback failed: %s", e)
 
-        ner_result = None
-        raw_response = None
+    def _save_turn(self, query, raw_response, session_id):
+        final_response = raw_response['text']
+        self._append_turn(session_id, query, final_response or "Sorry, I couldn't process that.")
+        return final_response
 
-        def run_ner():
-            nonlocal ner_result
-            ner_result = self.ner_model.extract_entities(audio_to_text)
+    def _respond(self, query, session_id):
+        # NER runs on the shared bounded executor while the chain runs in the calling thread
+        ner_future = get_executor().submit(self._extract_entities, query)
+        raw_response = self.chain.invoke(self._chain_inputs(query, session_id))
+        ner_result = ner_future.result()
+        return ner_result, self._save_turn(query, raw_response, session_id)
 
-        def run_llm():
-            nonlocal raw_response
-            raw_response = self.chain.invoke({"query": audio_to_text})
+    def forward(self, audio_path, session_id=DEFAULT_SESSION_ID):
+        audio_to_text = self.asr_model.transcribe(audio_path)
+        ner_result, final_response = self._respond(audio_to_text, session_id)
 
-        threads = [
-            threading.Thread(target=run_ner),
-            threading.Thread(target=run_llm)
-        ]
+        response_as_audio = self.tts_model.speak(speech_text(final_response))
 
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
+        return audio_to_text, ner_result, final_response, response_as_audio
 
-        final_response = raw_response['text']
-        self.memory.save_context(
-            {"query": audio_to_text},
-            {"output": final_response or "Sorry, I couldn't process that."}
-        )
-        
+    def chat(self, text, session_id=DEFAULT_SESSION_ID):
+        _, final_response = self._respond(text, session_id)
+        return final_response
 
-        response_as_audio = self.tts_model.speak(final_response.replace("*", ""))
+    async def _arespond(self, query, session_id):
+        ner_result, raw_response = await asyncio.gather(
+            run_blocking(self._extract_entities, query),
+            run_blocking(self.chain.invoke, self._chain_inputs(query, session_id)),
+        )
+        return ner_result, self._save_turn(query, raw_response, session_id)
 
-        return audio_to_text, ner_result, final_response, response_as_audio
+    async def aforward(self, audio_path, session_id=DEFAULT_SESSION_ID):
+        audio_to_text = await self.async_asr_model.transcribe(audio_path)
+        ner_result, final_response = await self._arespond(audio_to_text, session_id)
 
-    def chat(self, text):
-        ner_result = None
-        raw_response = None
+        response_as_audio = await self.async_tts_model.speak(speech_text(final_response))
 
-        def run_ner():
-            nonlocal ner_result
-            ner_result = self.ner_model.extract_entities(text)
+        return audio_to_text, ner_result, final_response, response_as_audio
 
-        def run_llm():
-            nonlocal raw_response
-            raw_response = self.chain.invoke({"query": text})
+    async def achat(self, text, session_id=DEFAULT_SESSION_ID):
+        _, final_response = await self._arespond(text, session_id)
+        return final_response
 
-        threads = [
-            threading.Thread(target=run_ner),
-            threading.Thread(target=run_llm)
-        ]
+    def stream_chat(self, text, session_id=DEFAULT_SESSION_ID):
+        """Yield sentence-level audio for the answer.
 
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
+        Each complete sentence is cleaned like get_response_for_audio() output and
+        sent to TTS on the shared executor right away; segments are yielded in
+        order as their audio becomes ready. A sentence whose TTS fails yields an
+        "audio_error" event instead and the stream carries on. The answer is
+        saved to memory even if the stream is cut short.
 
-        final_response = raw_response['text']
-        self.memory.save_context(
-            {"query": text},
-            {"output": final_response or "Sorry, I couldn't process that."}
-        )
-        return final_response
+        Sentences reach TTS while the answer is still being generated only if the
+        LLM streams (LLMModel.streams). The aiXplain SDK does not, so today the
+        whole answer arrives first and the gain is that its sentences are
+        synthesized in parallel, with the first one sent as soon as it is ready.
+        The "done" event's "llm_streamed" field says which case applied.
+        """
+        prompt = self.prompt_template.format_prompt(**self._chain_inputs(text, session_id)).to_string()
+
+        splitter = SentenceSplitter()
+        pending = deque()
+        parts = []
+        index = 0
+
+        def submit(sentences):
+            nonlocal index
+            for sentence in sentences:
+                clean = speech_text(sentence)
+                if clean:
+                    pending.append((index, clean, get_executor().submit(self.tts_model.speak, clean)))
+                    index += 1
+
+        def ready_segments(block):
+            while pending and (block or pending[0][2].done()):
+                segment_index, sentence, future = pending.popleft()
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    logger.warning("TTS failed for segment %d: %s", segment_index, e)
+                    yield {"event": "audio_error", "index": segment_index, "text": sentence, "error": str(e)}
+                    continue
+                yield {"event": "audio", "index": segment_index, "text": sentence, "audio": audio}
+
+        try:
+            try:
+                for chunk in self.llm.model.stream_response(prompt):
+                    parts.append(chunk)
+                    submit(splitter.feed(chunk))
+                    yield from ready_segments(block=False)
+            except Exception as e:
+                logger.warning("LLM streaming failed: %s", e)
+                if not parts:
+                    parts.append("Sorry, I couldn't process that.")
+                    submit(parts)
+            submit(splitter.flush())
+            yield from ready_segments(block=True)
+        finally:
+            # Also runs when the client disconnects and the generator is closed
+            final_response = "".join(parts).strip() or "Sorry, I couldn't generate a response."
+            self._append_turn(session_id, text, final_response)
+        yield {"event": "done", "response": final_response, "llm_streamed": getattr(self.llm.model, "streams", False)}
+
+    def stream_forward(self, audio_path, session_id=DEFAULT_SESSION_ID):
+        audio_to_text = self.asr_model.transcribe(audio_path)
+        yield {"event": "transcript", "text": audio_to_text}
+        yield from self.stream_chat(audio_to_text, session_id)
 
-    def get_conversation_history(self) -> list:
-        return self.memory.chat_memory.messages
+    def get_conversation_history(self, session_id=DEFAULT_SESSION_ID) -> list:
+        return self.sessions.get_messages(session_id)
 
-    def clear_memory(self) -> None:
-        self.memory.clear()
+    def clear_memory(self, session_id=None) -> None:
+        self.sessions.clear(session_id)
+        if self.memory is not None:
+            self.memory.clear(session_id)
     
 
 